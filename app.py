@@ -1,134 +1,488 @@
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, url_for, Response, stream_with_context
 from rag.rag_handler import RAGHandler
 from content_generation.content_generator import ContentGenerator
 from template.template_manager import TemplateManager
+from template.pptx_renderer import PPTXRenderer
 from pdf_export.pdf_exporter import PDFExporter
+from pdf_export.backends import create_backend
+from pdf_export.pdf_cache import PDFCache
 from document_management.document_handler import DocumentHandler
+from document_management.presentation_store import PresentationStore
+from jobs.job_queue import Job, JobQueue, JobQueueFullError
+from rag.topic_index import TopicIndex
+from rag.chat_handler import ChatHandler
+from rag.rag_handler import DEFAULT_SECTIONS
+from user_input.input_handler import InputHandler, UserInput
+from monitoring.metrics import REGISTRY, span
+from rag.index_factory import IndexConfig
+from rag.embeddings import EmbeddingConfig
+from rag.inference_pool import InferenceQueueFullError, PRIORITY_BATCH, PRIORITY_INTERACTIVE
 import os
+import atexit
 import logging
 import pdfkit
 import uuid
 import json
+import hashlib
+import zipfile
+from io import BytesIO
 from datetime import datetime
 import traceback
 
-logging.basicConfig(level=logging.DEBUG)
+# Con LOG_LEVEL=DEBUG se registran también contextos y textos generados completos
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
 # Initialize components
-# Inicializar RAG
+# Inicializar RAG (los modelos se cargan en segundo plano o bajo demanda)
 rag_handler = RAGHandler(
     model_path="models/llama-2-7b-chat.gguf",
-    embeddings_model="intfloat/multilingual-e5-large",
     data_dir="rag/data",
-    vector_store_path="rag/vector_store"
+    vector_store_path="rag/vector_store",
+    llm_instances=int(os.environ.get('LLM_INSTANCES', 1)),
+    llm_threads=int(os.environ.get('LLM_THREADS', 8)),
+    max_queue_depth=int(os.environ.get('LLM_MAX_QUEUE_DEPTH', 32)),
+    request_timeout=float(os.environ.get('LLM_REQUEST_TIMEOUT', 300)),
+    context_token_budget=int(os.environ.get('RAG_CONTEXT_TOKENS', 384)),
+    context_candidates=int(os.environ.get('RAG_CONTEXT_CANDIDATES', 8)),
+    index_config=IndexConfig(
+        index_type=os.environ.get('VECTOR_INDEX_TYPE', 'flat'),
+        mmap=os.environ.get('VECTOR_INDEX_MMAP', '0') == '1'
+    ),
+    embedding_config=EmbeddingConfig(
+        model_name=os.environ.get('EMBEDDINGS_MODEL', 'intfloat/multilingual-e5-large'),
+        backend=os.environ.get('EMBEDDINGS_BACKEND', 'torch'),
+        quantize=os.environ.get('EMBEDDINGS_QUANTIZE', '0') == '1',
+        batch_size=int(os.environ.get('EMBEDDINGS_BATCH_SIZE', 32)),
+        threads=int(os.environ.get('EMBEDDINGS_THREADS', 0)),
+        query_cache_size=int(os.environ.get('EMBEDDINGS_QUERY_CACHE', 1024))
+    )
 )
+if os.environ.get('RAG_WARMUP', '1') == '1':
+    rag_handler.start_warm_up()
 
 # Inicializar generador de contenido
 content_generator = ContentGenerator(rag_handler)
+chat_handler = ChatHandler(rag_handler)
 template_manager = TemplateManager()
+pptx_renderer = PPTXRenderer(
+    template_path=os.environ.get('PPTX_TEMPLATE'),
+    processes=int(os.environ.get('PPTX_RENDER_PROCESSES', 0)) or None
+)
+atexit.register(pptx_renderer.close)
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Índice semántico de temas para reutilizar presentaciones casi idénticas
+topic_index = TopicIndex(
+    rag_handler,
+    index_path="rag/topic_index",
+    threshold=float(os.environ.get('TOPIC_CACHE_THRESHOLD', 0.93))
+)
 document_handler = DocumentHandler(base_dir='path/to/documents')
-pdf_exporter = PDFExporter(document_handler)
+pdf_exporter = PDFExporter(
+    document_handler,
+    backend=create_backend(os.environ.get('PDF_BACKEND', 'reportlab')),
+    max_workers=int(os.environ.get('PDF_WORKERS', 2))
+)
+# El pool de render_many y los procesos del backend viven lo que la aplicación
+atexit.register(pdf_exporter.close)
 
 # Directorio para almacenar presentaciones
-PRESENTATIONS_DIR = os.path.join(os.path.dirname(__file__), 'presentations')
+PRESENTATIONS_DIR = os.environ.get('PRESENTATIONS_DIR', os.path.join(os.path.dirname(__file__), 'presentations'))
 os.makedirs(PRESENTATIONS_DIR, exist_ok=True)
 app.config['PRESENTATIONS_FOLDER'] = PRESENTATIONS_DIR
 
+# Repositorio indexado de presentaciones (importa los {id}.json antiguos la primera vez)
+presentation_store = PresentationStore(
+    os.path.join(PRESENTATIONS_DIR, 'presentations.sqlite'),
+    legacy_dir=PRESENTATIONS_DIR
+)
+
+# Versión del template HTML: si cambia, los PDFs cacheados dejan de ser válidos
+PDF_TEMPLATE_VERSION = '1'
+
+def _template_version() -> str:
+    template_path = os.path.join(app.root_path, 'templates', 'presentation.html')
+    digest = ''
+    if os.path.exists(template_path):
+        with open(template_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"{PDF_TEMPLATE_VERSION}-{digest}"
+
+pdf_cache = PDFCache(
+    os.path.join(PRESENTATIONS_DIR, 'pdf_cache'),
+    max_bytes=int(os.environ.get('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+    template_version=_template_version()
+)
+
+# Cola de trabajos: el número de workers limita cuántas generaciones usan el LLM a la vez
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('GENERATION_WORKERS', 2)),
+    max_pending=int(os.environ.get('GENERATION_MAX_PENDING', 100))
+)
+
+# Modo de generación: 'single' (un prompt para todo) u 'outline' (esquema + expansión por sección)
+GENERATION_MODES = ('single', 'outline')
+GENERATION_MODE = os.environ.get('GENERATION_MODE', 'single')
+
+# Métricas leídas en cada scrape de /metrics (sin cargar el LLM si aún no se ha usado)
+REGISTRY.gauge('inference_queue_depth', 'Requests waiting for a model instance',
+               lambda: rag_handler.scheduler_stats().get('queue_depth', 0))
+REGISTRY.gauge('inference_busy_instances', 'Model instances currently decoding',
+               lambda: rag_handler.scheduler_stats().get('busy_instances', 0))
+REGISTRY.gauge('jobs_queued', 'Generation jobs waiting for a worker', lambda: job_queue.stats()['queued'])
+REGISTRY.gauge('jobs_running', 'Generation jobs in progress', lambda: job_queue.stats()['running'])
+
+# Generación por lotes: temas por petición y llamadas al LLM simultáneas por lote
+BATCH_MAX_TOPICS = int(os.environ.get('GENERATION_BATCH_MAX_TOPICS', 200))
+BATCH_CONCURRENCY = int(os.environ.get('GENERATION_BATCH_CONCURRENCY', rag_handler.llm_instances))
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    if not rag_handler.ready:
+        # Reintenta un warm-up fallido (con espera) en lugar de quedarse en 503 para siempre
+        rag_handler.retry_warm_up()
+    status = rag_handler.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    data = request.json
-    message = data['message']
-    history = data['history']
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '')
+    if not message.strip():
+        return jsonify({'error': 'El mensaje no puede estar vacío'}), 400
+    if not isinstance(data.get('history', []), (list, type(None))):
+        return jsonify({'error': 'El historial debe ser una lista de turnos'}), 400
     
-    # Use RAG to get context and generate response
-    context = rag_handler.retrieve_information(message, generate=True)
-    
-    # Generate assistant response
-    response = "Entiendo que quieres una presentación sobre " + message + ". "
-    response += "Puedo ayudarte con eso. ¿Hay algo específico que te gustaría incluir?"
+    # Solo recuperación salvo que el mensaje pida generar texto (o se fuerce con 'generate')
+    try:
+        result = chat_handler.respond(message, data.get('history'), generate=data.get('generate'),
+                                      priority=PRIORITY_INTERACTIVE)
+    except InferenceQueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        print(f"Error en chat: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Error interno del servidor'}), 500
     
-    return jsonify({'response': response})
+    return jsonify(result)
+
+@app.route('/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    data = request.get_json(silent=True) or {}
+    message = data.get('message') or request.args.get('message', '')
+    if not message.strip():
+        return jsonify({'error': 'El mensaje no puede estar vacío'}), 400
+    if not isinstance(data.get('history', []), (list, type(None))):
+        return jsonify({'error': 'El historial debe ser una lista de turnos'}), 400
+    generate = data.get('generate')
+    wants_generation = generate if generate is not None else chat_handler.needs_generation(message)
+    if wants_generation and rag_handler.scheduler.is_saturated():
+        return jsonify({'error': 'Cola de inferencia llena, inténtalo más tarde'}), 429
+    return _sse_response(_stream_chat(message, data.get('history'), generate))
+
+def _reuse_similar_presentation(presentation_id: str, topic: str, slides_count: int = None):
+    """Copy the stored deck of a near-duplicate topic, if any, skipping the LLM"""
+    match = topic_index.lookup(topic)
+    if not match:
+        return None
+
+    source_id, similarity = match
+    source_data = _load_presentation(source_id)
+    if source_data is None:
+        topic_index.remove(source_id)
+        return None
+
+    slides_data = source_data.get('slides', [])
+    if slides_count is not None and len(slides_data) != slides_count:
+        # Otro tamaño de presentación: no sirve como copia
+        return None
+
+    logger.info("Reutilizando presentación %s (similitud %.3f) para: %s", source_id, similarity, topic)
+    _save_presentation(presentation_id, topic, slides_data)
+    return {
+        'id': presentation_id,
+        'slides': slides_data,
+        'reused_from': source_id,
+        'similarity': similarity
+    }
+
+def _run_generation(job: Job, user_input: UserInput, reuse: bool = True, mode: str = 'single') -> dict:
+    """Generate, convert and persist a presentation inside a job worker"""
+    presentation_id = job.id
+    topic = user_input.topic
+    # Con puntos clave el contenido es específico de esta petición: no se reutiliza
+    if reuse and not user_input.key_points:
+        job.set_progress('matching', 0.05)
+        reused = _reuse_similar_presentation(presentation_id, topic, user_input.slides_count)
+        if reused:
+            return reused
+
+    logger.info("Generando presentación sobre: %s", topic)
+
+    # Generar contenido usando RAG
+    if mode == 'outline':
+        # Esquema corto y expansión concurrente de cada sección
+        slides = [
+            slide.to_dict()
+            for slide in content_generator.generate_outlined(topic, sections=user_input.slides_count,
+                                                             progress_callback=job.set_progress,
+                                                             key_points=user_input.key_points)
+        ]
+    else:
+        slides = content_generator.generate_content(topic, progress_callback=job.set_progress,
+                                                    user_input=user_input)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Slides generados:\n%s", json.dumps(slides, ensure_ascii=False, indent=2))
+
+    # Convertir slides a formato JSON
+    job.set_progress('saving', 0.9)
+    slides_data = []
+    for slide in slides:
+        slide_dict = {
+            'title': slide['title'],
+            'content': slide['content'] if isinstance(slide['content'], list) else [slide['content']],
+            'notes': slide.get('notes')
+        }
+        slides_data.append(slide_dict)
+
+    _save_presentation(presentation_id, topic, slides_data)
+    topic_index.add(topic, presentation_id)
+    return {'id': presentation_id, 'slides': slides_data}
+
+def _run_batch_generation(job: Job, topics: list, reuse: bool = True) -> dict:
+    """Generate one deck per topic, sharing retrieval and bounding LLM concurrency"""
+    job.items = [{'topic': topic, 'id': str(uuid.uuid4()), 'status': 'queued'} for topic in topics]
+    total = len(job.items)
+    finished = 0
+
+    def mark_finished(item: dict, status: str, error: str = None) -> None:
+        nonlocal finished
+        item['status'] = status
+        if error:
+            item['error'] = error
+        finished += 1
+        job.set_progress('generating', finished / total)
+
+    pending = []
+    for item in job.items:
+        reused = _reuse_similar_presentation(item['id'], item['topic']) if reuse else None
+        if reused:
+            item['reused_from'] = reused['reused_from']
+            mark_finished(item, 'completed')
+        else:
+            item['status'] = 'generating'
+            pending.append(item)
+
+    def on_topic_done(i: int, status: str, slides_data, error) -> None:
+        item = pending[i]
+        if slides_data is not None:
+            _save_presentation(item['id'], item['topic'], slides_data)
+            topic_index.add(item['topic'], item['id'])
+        mark_finished(item, status, error)
+
+    if pending:
+        logger.info("Generando %d presentaciones por lotes", len(pending))
+        content_generator.generate_batch(
+            [item['topic'] for item in pending],
+            max_concurrency=BATCH_CONCURRENCY,
+            progress_callback=on_topic_done
+        )
+    return {'presentations': [dict(item) for item in job.items]}
+
+def _save_presentation(presentation_id: str, topic: str, slides_data: list) -> dict:
+    """Persist the presentation in the store and return its data"""
+    # Crear datos de la presentación
+    presentation_data = {
+        'id': presentation_id,
+        'topic': topic,
+        'slides': slides_data
+    }
+
+    # Guardar los datos en el repositorio (una única transacción)
+    with span('persistence'):
+        presentation_store.save(presentation_data)
+
+    logger.info("Presentación guardada: %s", presentation_id)
+    return presentation_data
+
+def _sse(event: str, data) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events) -> Response:
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _stream_slides(user_input: UserInput, presentation_id: str = None, priority: int = PRIORITY_BATCH):
+    """Yield SSE events for tokens and parsed slides; persist when presentation_id is given"""
+    topic = user_input.topic
+    slides_data = []
+    try:
+        yield _sse('start', {'id': presentation_id, 'topic': topic})
+        for kind, payload in content_generator.stream_content(topic, priority=priority,
+                                                              max_sections=user_input.slides_count,
+                                                              key_points=user_input.key_points):
+            if kind == 'token':
+                yield _sse('token', {'text': payload})
+            else:
+                slide_dict = payload.to_dict()
+                slides_data.append(slide_dict)
+                yield _sse('slide', {'index': len(slides_data) - 1, 'slide': slide_dict})
+        if presentation_id:
+            _save_presentation(presentation_id, topic, slides_data)
+            topic_index.add(topic, presentation_id)
+        yield _sse('done', {'id': presentation_id, 'slides': slides_data})
+    except Exception as e:
+        print(f"Error en streaming: {str(e)}")
+        traceback.print_exc()
+        yield _sse('error', {'error': str(e)})
+
+def _stream_chat(message: str, history, generate):
+    """Yield SSE events for a chat turn: tokens only when the LLM is used, then the answer"""
+    try:
+        for kind, payload in chat_handler.stream(message, history, generate=generate,
+                                                 priority=PRIORITY_INTERACTIVE):
+            if kind == 'token':
+                yield _sse('token', {'text': payload})
+            else:
+                yield _sse('answer', payload)
+    except Exception as e:
+        print(f"Error en chat: {str(e)}")
+        traceback.print_exc()
+        yield _sse('error', {'error': str(e)})
 
 @app.route('/generate', methods=['POST'])
 def generate_presentation():
     try:
-        data = request.get_json()
-        topic = data.get('topic', '')
-        
-        print(f"\nGenerando presentación sobre: {topic}")
-        
-        # Generar ID único para la presentación
+        data = request.get_json(silent=True) or {}
+        try:
+            # topic, slides_count (1-20) y key_points determinan prompt, recuperación y tokens
+            user_input = InputHandler.parse_json(data, default_slides_count=DEFAULT_SECTIONS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        reuse = bool(data.get('reuse', True))
+        mode = data.get('mode', GENERATION_MODE)
+        if mode not in GENERATION_MODES:
+            return jsonify({'error': f'Modo de generación desconocido: {mode}'}), 400
+
+        # Generar ID único para la presentación (también identifica el trabajo)
         presentation_id = str(uuid.uuid4())
-        
-        # Generar contenido usando RAG
-        slides = content_generator.generate_content(topic)
-        
-        print("\nSlides generados:")
-        for slide in slides:
-            print(f"\nTítulo: {slide.title}")
-            print("Contenido:")
-            for point in slide.content:
-                print(f"- {point}")
-        
-        # Convertir slides a formato JSON
-        slides_data = []
-        for slide in slides:
-            slide_dict = {
-                'title': slide.title,
-                'content': slide.content if isinstance(slide.content, list) else [slide.content],
-                'notes': slide.notes
-            }
-            slides_data.append(slide_dict)
-        
-        # Crear datos de la presentación
-        presentation_data = {
-            'id': presentation_id,
-            'topic': topic,
-            'slides': slides_data
-        }
-        
-        # Guardar los datos en un archivo
-        presentation_file = os.path.join(app.config['PRESENTATIONS_FOLDER'], f'{presentation_id}.json')
-        with open(presentation_file, 'w', encoding='utf-8') as f:
-            json.dump(presentation_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\nPresentación guardada en: {presentation_file}")
-        
+        job = job_queue.submit(presentation_id, lambda job: _run_generation(job, user_input, reuse, mode))
+
         return jsonify({
             'id': presentation_id,
-            'message': 'Presentación generada exitosamente',
-            'slides': slides_data
-        })
-        
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('job_status', job_id=job.id),
+            'pptx_url': url_for('download_pptx', presentation_id=presentation_id),
+            'message': 'Presentación en cola de generación'
+        }), 202
+
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         print(f"Error generando presentación: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_presentation_batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        topics = [str(topic).strip() for topic in data.get('topics', []) if str(topic).strip()]
+        if not topics:
+            return jsonify({'error': 'La lista de temas no puede estar vacía'}), 400
+        if len(topics) > BATCH_MAX_TOPICS:
+            return jsonify({'error': f'Máximo {BATCH_MAX_TOPICS} temas por lote'}), 400
+        reuse = bool(data.get('reuse', True))
+
+        job_id = str(uuid.uuid4())
+        job = job_queue.submit(job_id, lambda job: _run_batch_generation(job, topics, reuse), kind='batch')
+
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'topics': len(topics),
+            'status_url': url_for('job_status', job_id=job.id),
+            'message': 'Lote en cola de generación'
+        }), 202
+
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        print(f"Error generando lote: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/generate/stream', methods=['GET', 'POST'])
+def generate_presentation_stream():
+    # Mismos parámetros que /generate, también desde la query string (EventSource solo hace GET)
+    data = dict(request.args.to_dict(), **(request.get_json(silent=True) or {}))
+    try:
+        user_input = InputHandler.parse_json(data, default_slides_count=DEFAULT_SECTIONS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if rag_handler.scheduler.is_saturated():
+        return jsonify({'error': 'Cola de inferencia llena, inténtalo más tarde'}), 429
+    # Hay un cliente esperando cada token: prioridad interactiva
+    return _sse_response(_stream_slides(user_input, str(uuid.uuid4()), priority=PRIORITY_INTERACTIVE))
+
+@app.route('/jobs')
+def list_jobs():
+    status = request.args.get('status')
+    return jsonify({
+        'stats': job_queue.stats(),
+        'jobs': [job.to_dict() for job in job_queue.list_jobs(status)]
+    })
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms and queue gauges in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/inference/stats')
+def inference_stats():
+    # Sin crear el planificador: consultar estadísticas no debe cargar los modelos
+    return jsonify(dict(rag_handler.scheduler_stats(),
+                        context_packing=rag_handler.context_packer.stats(),
+                        embeddings=rag_handler.embedding_stats()))
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        'generation': rag_handler.generation_cache.stats(),
+        'pdf': pdf_cache.stats()
+    })
+
 @app.route('/view/<presentation_id>')
 def view_presentation(presentation_id):
     try:
-        # Cargar el archivo JSON de la presentación
-        presentation_file = os.path.join(app.config['PRESENTATIONS_FOLDER'], f'{presentation_id}.json')
-        if not os.path.exists(presentation_file):
+        presentation_data = _load_presentation(presentation_id)
+        if presentation_data is None:
             return "Presentación no encontrada", 404
 
-        with open(presentation_file, 'r', encoding='utf-8') as f:
-            presentation_data = json.load(f)
-            
         # Extraer el título del primer slide o usar uno por defecto
         title = "Presentación"
-        if isinstance(presentation_data, dict) and 'slides' in presentation_data:
-            slides = presentation_data['slides']
-        else:
-            slides = presentation_data if isinstance(presentation_data, list) else []
-            
+        slides = presentation_data['slides']
         if slides and slides[0].get('title'):
             title = slides[0]['title']
 
@@ -139,23 +493,129 @@ def view_presentation(presentation_id):
         print(f"Error viewing presentation: {str(e)}")
         return "Error interno del servidor", 500
 
+def _load_presentation(presentation_id: str):
+    """Load a presentation as a dict with 'slides', or None if it does not exist"""
+    presentation_data = presentation_store.get(presentation_id)
+    if presentation_data is None:
+        return None
+    if not isinstance(presentation_data, dict) or 'slides' not in presentation_data:
+        presentation_data = {
+            'slides': presentation_data if isinstance(presentation_data, list) else []
+        }
+    return presentation_data
+
+@app.route('/presentation/<presentation_id>/pptx')
+def download_pptx(presentation_id):
+    try:
+        presentation_data = _load_presentation(presentation_id)
+        if presentation_data is None:
+            return jsonify({'error': 'Presentación no encontrada'}), 404
+
+        # Se genera en memoria: cada petición tiene su propio buffer
+        with span('pptx_render'):
+            buffer = pptx_renderer.render(presentation_data)
+        return send_file(buffer,
+                         mimetype=PPTX_MIMETYPE,
+                         as_attachment=True,
+                         download_name=f'presentacion-{presentation_id}.pptx')
+    except Exception as e:
+        print(f"Error generating PPTX: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Error al generar PPTX'}), 500
+
+@app.route('/presentation/<presentation_id>/pdf')
+def download_presentation_pdf(presentation_id):
+    try:
+        presentation_data = _load_presentation(presentation_id)
+        if presentation_data is None:
+            return jsonify({'error': 'Presentación no encontrada'}), 404
+
+        with span('pdf_render'):
+            pdf_bytes = pdf_exporter.render(presentation_data)
+        return send_file(BytesIO(pdf_bytes),
+                         mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=f'presentacion-{presentation_id}.pdf')
+    except Exception as e:
+        print(f"Error generating PDF: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Error al generar PDF'}), 500
+
+@app.route('/presentations/pptx', methods=['POST'])
+def download_pptx_batch():
+    try:
+        ids = (request.get_json(silent=True) or {}).get('ids', [])
+        presentations = []
+        for presentation_id in ids:
+            presentation_data = _load_presentation(presentation_id)
+            if presentation_data is None:
+                return jsonify({'error': f'Presentación no encontrada: {presentation_id}'}), 404
+            presentations.append(presentation_data)
+
+        # Renderizado en paralelo en el pool de procesos del renderer
+        with span('pptx_render'):
+            decks = pptx_renderer.render_many(presentations)
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for presentation_id, deck in zip(ids, decks):
+                zf.writestr(f'presentacion-{presentation_id}.pptx', deck)
+        archive.seek(0)
+        return send_file(archive, mimetype='application/zip', as_attachment=True,
+                         download_name='presentaciones.zip')
+    except Exception as e:
+        print(f"Error generating PPTX batch: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Error al generar PPTX'}), 500
+
+@app.route('/presentations/pdf', methods=['POST'])
+def download_pdf_batch():
+    try:
+        ids = (request.get_json(silent=True) or {}).get('ids', [])
+        presentations = []
+        for presentation_id in ids:
+            presentation_data = _load_presentation(presentation_id)
+            if presentation_data is None:
+                return jsonify({'error': f'Presentación no encontrada: {presentation_id}'}), 404
+            presentations.append(presentation_data)
+
+        # Renderizado en paralelo en el pool del exportador (PDF_WORKERS)
+        with span('pdf_render'):
+            pdfs = pdf_exporter.render_many(presentations)
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for presentation_id, pdf in zip(ids, pdfs):
+                zf.writestr(f'presentacion-{presentation_id}.pdf', pdf)
+        archive.seek(0)
+        return send_file(archive, mimetype='application/zip', as_attachment=True,
+                         download_name='presentaciones-pdf.zip')
+    except Exception as e:
+        print(f"Error generating PDF batch: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': 'Error al generar PDF'}), 500
+
+@app.route('/presentations')
+def list_presentations():
+    """Newest-first listing; filter by topic prefix and page with next_cursor"""
+    try:
+        page = presentation_store.list(
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor'),
+            topic=request.args.get('topic')
+        )
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error listing presentations: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 @app.route('/presentation/<presentation_id>/data')
 def get_presentation_data(presentation_id):
     try:
-        # Cargar el archivo JSON de la presentación
-        presentation_file = os.path.join(app.config['PRESENTATIONS_FOLDER'], f'{presentation_id}.json')
-        if not os.path.exists(presentation_file):
+        presentation_data = _load_presentation(presentation_id)
+        if presentation_data is None:
             return jsonify({'error': 'Presentación no encontrada'}), 404
 
-        with open(presentation_file, 'r', encoding='utf-8') as f:
-            presentation_data = json.load(f)
-            
-        # Asegurarse de que los datos tienen el formato correcto
-        if not isinstance(presentation_data, dict) or 'slides' not in presentation_data:
-            presentation_data = {
-                'slides': presentation_data if isinstance(presentation_data, list) else []
-            }
-            
         return jsonify(presentation_data)
     except Exception as e:
         print(f"Error loading presentation data: {str(e)}")
@@ -165,22 +625,35 @@ def get_presentation_data(presentation_id):
 def download_pdf(presentation_id):
     try:
         # Load presentation data
-        with open(os.path.join(app.config['PRESENTATIONS_FOLDER'], f'{presentation_id}.json'), 'r', encoding='utf-8') as f:
-            presentation_data = json.load(f)
+        presentation_data = _load_presentation(presentation_id)
+        if presentation_data is None:
+            return "Presentación no encontrada", 404
         
-        # Generate HTML content
-        html_content = render_template('presentation.html',
-                                     title=presentation_data['topic'],
-                                     content=presentation_data['slides'],
-                                     presentation_id=presentation_id)
+        def render_pdf() -> bytes:
+            # Generate HTML content
+            with span('html_render'):
+                html_content = render_template('presentation.html',
+                                             title=presentation_data.get('topic', 'Presentación'),
+                                             content=presentation_data['slides'],
+                                             presentation_id=presentation_id)
+            # Convert to PDF (False = devolver los bytes en vez de escribir un fichero)
+            with span('pdf_render'):
+                return pdfkit.from_string(html_content, False)
         
-        # Convert to PDF
-        pdf_path = os.path.join(app.config['PRESENTATIONS_FOLDER'], f'{presentation_id}.pdf')
-        pdfkit.from_string(html_content, pdf_path)
+        # Solo se renderiza si el contenido o el template cambiaron; peticiones
+        # simultáneas del mismo PDF comparten un único render
+        cache_key = pdf_cache.key_for(presentation_data)
+        # Se sirve desde el fichero ya abierto: una expulsión concurrente no lo invalida
+        pdf_file, last_modified = pdf_cache.open(cache_key, render_pdf)
         
-        return send_file(pdf_path, 
+        return send_file(pdf_file, 
+                        mimetype='application/pdf',
                         as_attachment=True, 
-                        download_name='presentacion.pdf')
+                        download_name='presentacion.pdf',
+                        etag=cache_key,
+                        last_modified=last_modified,
+                        conditional=True,
+                        max_age=0)
     except Exception as e:
         logging.error(f'Error downloading PDF: {str(e)}')
         return "Error al generar PDF", 500
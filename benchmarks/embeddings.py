@@ -0,0 +1,176 @@
+# Benchmark de backends de embeddings: velocidad y calidad de recuperación frente al modelo actual
+#
+#   python -m benchmarks.embeddings --candidates e5-base:onnx:int8 e5-small:onnx:int8 --output embeddings.json
+#
+# Cada configuración se escribe como modelo[:torch|onnx][:int8][:noprefix]. La referencia por
+# defecto es la configuración histórica: e5-large en torch, float32 y sin prefijos.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Sequence, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from rag.embeddings import EMBEDDING_BACKENDS, EmbeddingConfig, create_embeddings
+from rag.ingestion import SUPPORTED_EXTENSIONS, _peak_rss_mb
+
+SENTENCE = re.compile(r'[^.!?\n]+[.!?]?')
+
+
+def parse_spec(spec: str, batch_size: int, threads: int) -> EmbeddingConfig:
+    """"e5-small:onnx:int8" -> EmbeddingConfig"""
+    model, *flags = spec.split(':')
+    unknown = [flag for flag in flags if flag not in EMBEDDING_BACKENDS + ('int8', 'noprefix')]
+    if unknown:
+        raise ValueError(f"Opciones desconocidas en {spec}: {unknown}")
+    backend = next((flag for flag in flags if flag in EMBEDDING_BACKENDS), 'torch')
+    kwargs = {}
+    if 'noprefix' in flags:
+        kwargs.update(query_prefix='', passage_prefix='')
+    return EmbeddingConfig(model_name=model, backend=backend, quantize='int8' in flags,
+                           batch_size=batch_size, threads=threads, **kwargs)
+
+
+def load_chunks(data_dir: str, max_chunks: int) -> List[str]:
+    """Split the knowledge base like the ingestor does"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    chunks = []
+    for root, dirnames, filenames in os.walk(data_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                with open(os.path.join(root, filename), 'r', encoding='utf-8') as f:
+                    chunks.extend(splitter.split_text(f.read()))
+            if len(chunks) >= max_chunks:
+                return chunks[:max_chunks]
+    return chunks
+
+
+def make_queries(chunks: Sequence[str], count: int, seed: int = 0) -> List[Tuple[str, int]]:
+    """Pseudo-queries: one sentence (at most 16 words) taken from a chunk, paired with that chunk"""
+    rng = random.Random(seed)
+    queries = []
+    for target in rng.sample(range(len(chunks)), min(count, len(chunks))):
+        sentences = [s.strip() for s in SENTENCE.findall(chunks[target]) if len(s.split()) >= 4]
+        if sentences:
+            queries.append((" ".join(rng.choice(sentences).split()[:16]), target))
+    return queries
+
+
+def top_k(query_vectors: np.ndarray, chunk_vectors: np.ndarray, k: int) -> np.ndarray:
+    """Exact cosine top-k (the same ranking as the flat L2 index on normalized vectors)"""
+    q = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    c = chunk_vectors / np.maximum(np.linalg.norm(chunk_vectors, axis=1, keepdims=True), 1e-12)
+    scores = q @ c.T
+    k = min(k, scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def run_config(config: EmbeddingConfig, chunks: List[str], queries: List[Tuple[str, int]],
+               k: int) -> Tuple[Dict, np.ndarray]:
+    start = time.perf_counter()
+    embeddings = create_embeddings(config)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    passage_seconds = time.perf_counter() - start
+
+    texts = [text for text, _ in queries]
+    start = time.perf_counter()
+    query_vectors = np.asarray(embeddings.embed_queries(texts), dtype=np.float32)
+    query_seconds = time.perf_counter() - start
+    # Segunda pasada: todas las consultas salen de la caché LRU
+    start = time.perf_counter()
+    embeddings.embed_queries(texts)
+    cached_seconds = time.perf_counter() - start
+
+    found = top_k(query_vectors, chunk_vectors, k)
+    targets = [target for _, target in queries]
+    ranks = [list(row).index(target) + 1 if target in row else None for row, target in zip(found, targets)]
+    result = {
+        'config': config.to_dict(),
+        'dim': int(chunk_vectors.shape[1]),
+        'load_seconds': round(load_seconds, 3),
+        'passages_per_second': round(len(chunks) / passage_seconds, 1),
+        'queries_per_second': round(len(texts) / query_seconds, 1),
+        'cached_queries_per_second': round(len(texts) / max(cached_seconds, 1e-9), 1),
+        f'hit_rate_at_{k}': round(sum(1 for rank in ranks if rank) / len(ranks), 4),
+        'mrr': round(sum(1 / rank for rank in ranks if rank) / len(ranks), 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+    del embeddings
+    gc.collect()
+    return result, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embeddings/s y calidad de recuperación por backend")
+    parser.add_argument('--data-dir', default="rag/data")
+    parser.add_argument('--reference', default='e5-large:torch:noprefix',
+                        help="Configuración contra la que se mide el recall (la actual)")
+    parser.add_argument('--candidates', nargs='+',
+                        default=['e5-large:torch', 'e5-large:onnx:int8', 'e5-base:onnx:int8', 'e5-small:onnx:int8'])
+    parser.add_argument('--max-chunks', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--output', help="Fichero JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.data_dir, args.max_chunks)
+    if len(chunks) < 2:
+        raise SystemExit(f"No hay suficientes fragmentos en {args.data_dir}")
+    queries = make_queries(chunks, args.queries)
+    if not queries:
+        raise SystemExit(f"No se pudieron generar consultas a partir de {args.data_dir}")
+
+    reference, reference_found = run_config(
+        parse_spec(args.reference, args.batch_size, args.threads), chunks, queries, args.k
+    )
+    rows = []
+    for spec in args.candidates:
+        row, found = run_config(parse_spec(spec, args.batch_size, args.threads), chunks, queries, args.k)
+        overlap = sum(len(set(a) & set(b)) for a, b in zip(found, reference_found))
+        row[f'recall_at_{args.k}_vs_reference'] = round(overlap / reference_found.size, 4)
+        row['speedup_vs_reference'] = round(row['passages_per_second'] / reference['passages_per_second'], 2)
+        rows.append(dict(spec=spec, **row))
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'chunks': len(chunks),
+            'queries': len(queries),
+            'k': args.k,
+        },
+        'reference': dict(spec=args.reference, **reference),
+        'candidates': rows,
+    }
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
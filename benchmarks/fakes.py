@@ -0,0 +1,82 @@
+# Modelos falsos y deterministas para medir el pipeline sin pesos ni red
+
+import re
+import time
+import zlib
+from typing import Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WORD = re.compile(r'\w+', re.UNICODE)
+TOKEN = re.compile(r'\S+\s*')
+SECTIONS_REQUEST = re.compile(r'Genera (\d+) secciones')
+OUTLINE_REQUEST = re.compile(r'títulos de (\d+) secciones')
+SECTION_REQUEST = re.compile(r'contenido de la sección "([^"]*)"')
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: deterministic, fast and similar for texts sharing words"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD.findall(text.lower()):
+                h = zlib.crc32(word.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM:
+    """Stands in for a ctransformers model: model(prompt, stream=True, **params) -> tokens
+
+    Answers every prompt kind used by the app (full deck, outline, single
+    section, chat) with well-formed text; token_delay simulates decode speed.
+    """
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def tokenize(self, text: str) -> List[int]:
+        return [zlib.crc32(token.encode('utf-8')) for token in TOKEN.findall(text)]
+
+    def __call__(self, prompt: str, stream: bool = False, max_new_tokens: Optional[int] = None, **params):
+        tokens = TOKEN.findall(self.completion(prompt))
+        if max_new_tokens:
+            tokens = tokens[:max_new_tokens]
+        if stream:
+            return self._stream(tokens)
+        return "".join(tokens)
+
+    def completion(self, prompt: str) -> str:
+        match = OUTLINE_REQUEST.search(prompt)
+        if match:
+            return "\n".join(f"{i}. Aspecto {i} del tema" for i in range(1, int(match.group(1)) + 1))
+        match = SECTION_REQUEST.search(prompt)
+        if match:
+            return (f"- {match.group(1)} define el alcance del tema.\n"
+                    f"- Tiene aplicaciones prácticas claras.\n"
+                    f"- Conviene medir sus resultados.\n")
+        match = SECTIONS_REQUEST.search(prompt)
+        if match:
+            return "\n".join(
+                f"Sección {i} - Aspecto {i}\n"
+                f"Contenido detallado: Primer punto de la sección {i}. "
+                f"Segundo punto con un ejemplo. Tercer punto con una conclusión.\n"
+                for i in range(1, int(match.group(1)) + 1)
+            )
+        return "Es un tema interesante y se puede presentar en pocas diapositivas."
+
+    def _stream(self, tokens: List[str]) -> Iterator[str]:
+        for token in tokens:
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
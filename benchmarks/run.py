@@ -0,0 +1,300 @@
+# Benchmarks offline de los caminos críticos (sin modelos reales, GPU ni red)
+#
+#   python -m benchmarks.run --output results.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, TOKEN
+from rag.ingestion import _peak_rss_mb
+
+VOCABULARY = (
+    "energía solar eólica datos análisis modelo aprendizaje red clima agua ciudad salud "
+    "educación mercado empresa producto cliente diseño proceso calidad riesgo seguridad "
+    "software nube servidor usuario equipo proyecto historia cultura arte ciencia física "
+    "química biología economía política sociedad transporte logística innovación"
+).split()
+
+QUERIES = [
+    "energía solar en la ciudad", "análisis de datos de clientes", "seguridad en la nube",
+    "historia del arte", "innovación en transporte", "calidad del proceso de diseño",
+    "economía y sociedad", "aprendizaje de modelos", "salud y educación", "riesgo del proyecto",
+]
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _latency_summary(seconds: Sequence[float]) -> Dict:
+    return {
+        'p50_ms': round(_percentile(seconds, 0.5) * 1000, 3),
+        'p95_ms': round(_percentile(seconds, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(seconds) * 1000, 3) if seconds else 0.0,
+    }
+
+
+def _peak_memory(func: Callable[[], object]) -> Tuple[object, float]:
+    """Run func once under tracemalloc and return (result, peak allocated MB)"""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, round(peak / (1024 * 1024), 2)
+
+
+def _write_corpus(data_dir: str, chunks: int, seed: int = 0) -> None:
+    """Write `chunks` synthetic paragraphs (one chunk each) split over several files"""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    per_file = 1000
+    for start in range(0, chunks, per_file):
+        paragraphs = [
+            " ".join(rng.choice(VOCABULARY) for _ in range(60)).capitalize() + "."
+            for _ in range(min(per_file, chunks - start))
+        ]
+        with open(os.path.join(data_dir, f'corpus_{start // per_file:04d}.txt'), 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(paragraphs))
+
+
+def _fake_handler(workdir: str, **kwargs):
+    from rag.rag_handler import RAGHandler
+
+    return RAGHandler(
+        data_dir=os.path.join(workdir, 'data'),
+        vector_store_path=os.path.join(workdir, 'vector_store'),
+        cache_dir=os.path.join(workdir, 'cache'),
+        llm_factory=FakeLLM,
+        embeddings_factory=FakeEmbeddings,
+        **kwargs
+    )
+
+
+def bench_retrieval(workdir: str, corpus_sizes: Sequence[int], queries: int) -> List[Dict]:
+    """Retrieval latency (single and batched) as the corpus grows"""
+    results = []
+    query_list = [QUERIES[i % len(QUERIES)] for i in range(queries)]
+    for size in corpus_sizes:
+        corpus_dir = os.path.join(workdir, f'retrieval_{size}')
+        _write_corpus(os.path.join(corpus_dir, 'data'), size)
+        handler = _fake_handler(corpus_dir)
+
+        start = time.perf_counter()
+        handler.vector_store
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        for query in query_list:
+            start = time.perf_counter()
+            handler.retrieve_context(query)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        handler.retrieve_contexts(query_list)
+        batched = time.perf_counter() - start
+
+        results.append(dict(
+            corpus_chunks=size,
+            build_seconds=round(build_seconds, 3),
+            queries=len(query_list),
+            batched_per_query_ms=round(batched / len(query_list) * 1000, 3),
+            **_latency_summary(latencies)
+        ))
+    return results
+
+
+def bench_parser(sections: int, repeats: int) -> Dict:
+    """Throughput of SectionStreamParser fed token by token"""
+    from content_generation.section_parser import SectionStreamParser
+
+    text = FakeLLM().completion(f"Genera {sections} secciones para una presentación sobre benchmarks.")
+    tokens = TOKEN.findall(text)
+
+    def parse():
+        parser = SectionStreamParser()
+        slides = []
+        for token in tokens:
+            slides.extend(parser.feed(token))
+        slides.extend(parser.close())
+        return slides
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        slides = parse()
+        timings.append(time.perf_counter() - start)
+    _, peak_mb = _peak_memory(parse)
+    best = min(timings)
+    return {
+        'sections': len(slides),
+        'tokens': len(tokens),
+        'tokens_per_second': round(len(tokens) / best),
+        'mb_per_second': round(len(text.encode('utf-8')) / best / (1024 * 1024), 2),
+        'best_seconds': round(best, 6),
+        'peak_mb': peak_mb,
+    }
+
+
+def bench_export(slides: int, repeats: int) -> Dict:
+    """PPTX (python-pptx) and PDF (reportlab) rendering of one synthetic deck"""
+    from pdf_export.backends import ReportLabBackend
+    from template.pptx_renderer import PPTXRenderer
+
+    deck = {
+        'id': 'benchmark',
+        'topic': 'Benchmark de exportación',
+        'slides': [
+            {'title': f'Aspecto {i}', 'content': [f'Punto {j} de la diapositiva {i}.' for j in range(1, 5)],
+             'notes': f'Notas de la diapositiva {i}'}
+            for i in range(1, slides + 1)
+        ],
+    }
+    results = {}
+    for name, render in (('pptx', PPTXRenderer().render_bytes), ('pdf', ReportLabBackend().render)):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = render(deck)
+            timings.append(time.perf_counter() - start)
+        _, peak_mb = _peak_memory(lambda: render(deck))
+        results[name] = dict(slides=slides, bytes=len(output), peak_mb=peak_mb, **_latency_summary(timings))
+    return results
+
+
+def bench_generate(workdir: str, requests_total: int, concurrency_levels: Sequence[int],
+                   token_delay: float) -> List[Dict]:
+    """/generate end to end (enqueue + job completion) through the Flask test client"""
+    app_dir = os.path.join(workdir, 'app')
+    _write_corpus(os.path.join(app_dir, 'rag', 'data'), 200)
+    max_concurrency = max(concurrency_levels)
+    os.environ.update({
+        'RAG_WARMUP': '0',
+        'PRESENTATIONS_DIR': os.path.join(app_dir, 'presentations'),
+        'GENERATION_WORKERS': str(max_concurrency),
+        'GENERATION_MAX_PENDING': str(requests_total * 2),
+        'LLM_INSTANCES': str(max_concurrency),
+        'LOG_LEVEL': 'WARNING',
+    })
+    previous_cwd = os.getcwd()
+    # Las rutas relativas de app.py (rag/..., path/to/documents) quedan dentro del directorio temporal
+    os.chdir(app_dir)
+    try:
+        import app as app_module
+
+        app_module.rag_handler.llm_factory = lambda: FakeLLM(token_delay)
+        app_module.rag_handler.embeddings_factory = FakeEmbeddings
+
+        def one_request(label: str) -> Tuple[float, str]:
+            client = app_module.app.test_client()
+            start = time.perf_counter()
+            response = client.post('/generate', json={'topic': f'Tema {label}', 'reuse': False})
+            if response.status_code != 202:
+                return time.perf_counter() - start, f'http_{response.status_code}'
+            status_url = response.get_json()['status_url']
+            while True:
+                status = client.get(status_url).get_json()['status']
+                if status in ('completed', 'failed'):
+                    return time.perf_counter() - start, status
+                time.sleep(0.002)
+
+        # Primera petición fuera de la medida: carga el vector store y las instancias falsas
+        one_request('warmup')
+
+        results = []
+        for concurrency in concurrency_levels:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                outcomes = list(executor.map(one_request,
+                                             [f'{concurrency}-{i}' for i in range(requests_total)]))
+            elapsed = time.perf_counter() - start
+            latencies = [seconds for seconds, _ in outcomes]
+            results.append(dict(
+                concurrency=concurrency,
+                requests=requests_total,
+                failed=sum(1 for _, status in outcomes if status != 'completed'),
+                requests_per_second=round(requests_total / elapsed, 2),
+                **_latency_summary(latencies)
+            ))
+        app_module.job_queue.shutdown()
+        return results
+    finally:
+        os.chdir(previous_cwd)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in re.split(r'[,\s]+', value.strip()) if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline con LLM y embeddings falsos")
+    parser.add_argument('--output', help="Fichero JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--only', nargs='*', choices=['retrieval', 'parser', 'export', 'generate'],
+                        help="Ejecutar solo estos benchmarks")
+    parser.add_argument('--corpus-sizes', type=_int_list, default=[1000, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--parser-sections', type=int, default=500)
+    parser.add_argument('--export-slides', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4, 8])
+    parser.add_argument('--token-delay', type=float, default=0.0,
+                        help="Segundos por token del LLM falso (simula la velocidad de decodificación)")
+    parser.add_argument('--keep-workdir', action='store_true')
+    args = parser.parse_args()
+
+    selected = set(args.only or ['retrieval', 'parser', 'export', 'generate'])
+    workdir = tempfile.mkdtemp(prefix='presentation_bench_')
+    results: Dict = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key != 'output'},
+        }
+    }
+    try:
+        if 'parser' in selected:
+            results['parser'] = bench_parser(args.parser_sections, args.repeats)
+        if 'export' in selected:
+            results['export'] = bench_export(args.export_slides, args.repeats)
+        if 'retrieval' in selected:
+            results['retrieval'] = bench_retrieval(workdir, args.corpus_sizes, args.queries)
+        if 'generate' in selected:
+            results['generate'] = bench_generate(workdir, args.requests, args.concurrency, args.token_delay)
+        results['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Raíz del repositorio en sys.path para que los tests importen los paquetes (rag, content_generation...)
@@ -1,42 +1,14 @@
 # Lógica para generar texto y sugerencias visuales
 
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from rag.rag_handler import RAGHandler
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from content_generation.section_parser import SectionStreamParser, parse_outline, split_points
+from content_generation.slide_content import SlideContent
+from rag.rag_handler import RAGHandler, DEFAULT_SECTIONS, MAX_SECTIONS_PER_CALL, POINTS_PER_SECTION
+from user_input.input_handler import UserInput
+from rag.inference_pool import InferenceQueueFullError, PRIORITY_BATCH
+from monitoring.metrics import observe_stage
 import traceback
-import json
-
-@dataclass
-class SlideContent:
-    """Represents the content of a single slide"""
-    title: str
-    content: List[str]
-    notes: Optional[str] = None
-    
-    def to_dict(self) -> Dict:
-        """Convert SlideContent to dictionary"""
-        return {
-            'title': self.title,
-            'content': self.content,
-            'notes': self.notes
-        }
-
-    @classmethod
-    def from_dict(cls, data: Dict) -> 'SlideContent':
-        """Create SlideContent from dictionary"""
-        return cls(
-            title=data.get('title', ''),
-            content=data.get('content', []),
-            notes=data.get('notes', '')
-        )
-
-    def __str__(self) -> str:
-        """String representation for debugging"""
-        return f"SlideContent(title='{self.title}', content={self.content}, notes='{self.notes}')"
-    
-    def format_bullet_points(self, content: List[str]) -> List[str]:
-        """Format content as bullet points"""
-        return [f"• {point}" for point in content if point.strip()]
 
 class ContentGenerator:
     def __init__(self, rag_handler: RAGHandler):
@@ -50,42 +22,199 @@ class ContentGenerator:
             notes="Slide de título principal"
         )
     
-    def generate_content(self, topic: str) -> List[Dict]:
-        """Generar contenido basado en el tema"""
-        raw_content = self.rag_handler.retrieve_information(topic, generate=True)
-
-        # Procesar el contenido en secciones
-        sections = []  # Aquí se debe procesar el contenido en secciones
-        lines = raw_content.split('\n')
-        current_section = None
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if line.startswith('Sección'):
-                if current_section:
-                    sections.append(current_section)
-                current_section = {'title': line, 'content': []}
-            else:
-                if current_section:
-                    current_section['content'].append(line)
-
-        if current_section:
-            sections.append(current_section)  # Agregar última sección si existe
-
-        # Crear diapositivas a partir de las secciones procesadas
-        slides = []
-        for section in sections:
-            slide = SlideContent(
-                title=section['title'],
-                content=section['content']
-            )
-            slides.append(slide.to_dict())  # Usar to_dict para convertir a dict
+    def generate_content(self, topic: str,
+                         progress_callback: Optional[Callable[[str, float], None]] = None,
+                         max_sections: int = DEFAULT_SECTIONS,
+                         priority: int = PRIORITY_BATCH,
+                         user_input: Optional[UserInput] = None) -> List[Dict]:
+        """Generar contenido basado en el tema
+
+        With user_input, its topic, slides_count and key_points drive the prompt,
+        the retrieval queries (one per key point) and the token budget. Decks larger
+        than MAX_SECTIONS_PER_CALL are generated across several calls.
+        """
+        key_points: List[str] = []
+        if user_input is not None:
+            topic = user_input.topic
+            max_sections = user_input.slides_count
+            key_points = list(user_input.key_points)
+
+        if progress_callback:
+            progress_callback('generating', 0.1)
+
+        calls = -(-max_sections // MAX_SECTIONS_PER_CALL)
+        slides: List[SlideContent] = []
+        try:
+            for call in range(calls):
+                start = call * MAX_SECTIONS_PER_CALL
+                sections = min(MAX_SECTIONS_PER_CALL, max_sections - start)
+                # Cada llamada se centra en su parte de los puntos clave
+                call_points = key_points[call::calls]
+                context = None
+                if call_points:
+                    context = self.rag_handler.retrieve_merged_context(
+                        [topic] + [f"{topic}: {point}" for point in call_points]
+                    )
+                instructions = self._instructions(call_points, start, sections, max_sections,
+                                                  [slide.title for slide in slides])
+
+                # Las secciones se parsean a medida que llegan los tokens
+                parser = SectionStreamParser(max_sections=sections, expected_points=POINTS_PER_SECTION)
+                for token in self.rag_handler.stream_generation(topic, context=context, priority=priority,
+                                                                should_stop=lambda: parser.done,
+                                                                is_complete=lambda: parser.complete,
+                                                                sections=sections,
+                                                                instructions=instructions):
+                    for slide in parser.feed(token):
+                        slides.append(slide)
+                        if progress_callback:
+                            progress_callback('generating', 0.1 + 0.8 * len(slides) / max_sections)
+                slides.extend(parser.close())
+                observe_stage('parsing', parser.parse_seconds)
+        except InferenceQueueFullError:
+            # Contrapresión: el llamador decide (p.ej. responder 429)
+            raise
+        except Exception as e:
+            print(f"Error generando contenido: {str(e)}")
+            traceback.print_exc()
+            # Se conservan las secciones ya generadas y solo se completan las que faltan
+            slides = slides[:max_sections]
+            slides.extend(self._fallback_slides(max_sections - len(slides), len(slides)))
+
+        return [slide.to_dict() for slide in slides]
 
+    def _fallback_slides(self, count: int, start: int = 0) -> List[SlideContent]:
+        """Generic sections to complete a deck whose generation failed"""
+        if count <= 0:
+            return []
+        parser = SectionStreamParser()
+        templates = parser.feed(self.rag_handler.get_fallback_content()) + parser.close()
+        slides = []
+        for i in range(start, start + count):
+            template = templates[i % len(templates)]
+            # Si se piden más secciones que las de reserva, se repiten numeradas
+            rounds = i // len(templates)
+            title = f"{template.title} ({rounds + 1})" if rounds else template.title
+            slides.append(SlideContent(title=title, content=list(template.content)))
         return slides
     
+    @staticmethod
+    def _instructions(key_points: List[str], start: int, sections: int, total: int,
+                      previous_titles: List[str]) -> str:
+        """Extra prompt instructions for key points and multi-call decks"""
+        parts = []
+        if total > sections:
+            parts.append(f"Son las secciones {start + 1} a {start + sections} de {total}.")
+        if previous_titles:
+            parts.append(f"No repitas estas secciones ya escritas: {'; '.join(previous_titles)}.")
+        if key_points:
+            parts.append(f"Cubre estos puntos clave: {'; '.join(key_points)}.")
+        return " ".join(parts)
+    
+    def generate_batch(self, topics: List[str], max_concurrency: int = 2,
+                       priority: int = PRIORITY_BATCH,
+                       progress_callback: Optional[Callable[[int, str, Optional[List[Dict]], Optional[str]], None]] = None
+                       ) -> List[Dict]:
+        """Generate decks for several topics sharing one batched retrieval
+
+        Queries are embedded and searched together; LLM generations then run with at
+        most max_concurrency requests in flight. progress_callback(i, status, slides, error)
+        is called as each topic finishes. Returns {'topic', 'slides'} or {'topic', 'error'} per topic.
+        """
+        contexts = self.rag_handler.retrieve_contexts(topics)
+
+        def generate(topic: str, context: str) -> List[Dict]:
+            parser = SectionStreamParser()
+            raw_content = self.rag_handler.generate_raw(topic, context, priority=priority)
+            return [slide.to_dict() for slide in parser.feed(raw_content) + parser.close()]
+
+        results: List[Dict] = [{'topic': topic} for topic in topics]
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency),
+                                thread_name_prefix='batch-generation') as executor:
+            futures = {
+                executor.submit(generate, topic, context): i
+                for i, (topic, context) in enumerate(zip(topics, contexts))
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i]['slides'] = future.result()
+                    if progress_callback:
+                        progress_callback(i, 'completed', results[i]['slides'], None)
+                except Exception as e:
+                    print(f"Error generando '{topics[i]}': {str(e)}")
+                    results[i]['error'] = str(e)
+                    if progress_callback:
+                        progress_callback(i, 'failed', None, str(e))
+        return results
+    
+    def generate_outlined(self, topic: str, sections: int = 4, priority: int = PRIORITY_BATCH,
+                          progress_callback: Optional[Callable[[str, float], None]] = None,
+                          key_points: Optional[List[str]] = None) -> List[SlideContent]:
+        """Two-phase generation: a short outline call, then one expansion call per section
+
+        Each section is expanded with its own retrieved context and the expansions
+        run concurrently across the inference pool, so no single prompt has to fit
+        the whole deck in the model context. key_points reach both prompts.
+        """
+        if progress_callback:
+            progress_callback('outlining', 0.1)
+        context = self.rag_handler.retrieve_contexts([topic])[0]
+        titles = parse_outline(
+            self.rag_handler.generate_outline(topic, context, sections=sections, priority=priority,
+                                              key_points=key_points)
+        )[:sections]
+        if not titles:
+            raise ValueError(f"El esquema generado para '{topic}' no contiene secciones")
+
+        if progress_callback:
+            progress_callback('expanding', 0.3)
+        contexts = self.rag_handler.retrieve_contexts([f"{topic}: {title}" for title in titles])
+        bodies = self.rag_handler.expand_sections(topic, titles, contexts, priority=priority,
+                                                  key_points=key_points)
+
+        return [
+            SlideContent(title=title, content=split_points(body.splitlines()))
+            for title, body in zip(titles, bodies)
+        ]
+    
+    def stream_content(self, topic: str, priority: int = PRIORITY_BATCH,
+                       max_sections: int = DEFAULT_SECTIONS,
+                       key_points: Optional[List[str]] = None) -> Iterator[Tuple[str, object]]:
+        """Yield ('token', str) events while generating and ('slide', SlideContent) per finished section
+
+        Each call stops decoding as soon as its sections have been parsed. Like
+        generate_content, larger decks are split into MAX_SECTIONS_PER_CALL calls.
+        """
+        key_points = list(key_points or [])
+        calls = -(-max_sections // MAX_SECTIONS_PER_CALL)
+        titles: List[str] = []
+        for call in range(calls):
+            start = call * MAX_SECTIONS_PER_CALL
+            sections = min(MAX_SECTIONS_PER_CALL, max_sections - start)
+            call_points = key_points[call::calls]
+            context = None
+            if call_points:
+                context = self.rag_handler.retrieve_merged_context(
+                    [topic] + [f"{topic}: {point}" for point in call_points]
+                )
+            instructions = self._instructions(call_points, start, sections, max_sections, titles)
+
+            parser = SectionStreamParser(max_sections=sections, expected_points=POINTS_PER_SECTION)
+            for token in self.rag_handler.stream_generation(topic, context=context, priority=priority,
+                                                            should_stop=lambda: parser.done,
+                                                            is_complete=lambda: parser.complete,
+                                                            sections=sections,
+                                                            instructions=instructions):
+                yield 'token', token
+                for slide in parser.feed(token):
+                    titles.append(slide.title)
+                    yield 'slide', slide
+            for slide in parser.close():
+                titles.append(slide.title)
+                yield 'slide', slide
+            observe_stage('parsing', parser.parse_seconds)
+    
     def format_bullet_points(self, content: List[str]) -> List[str]:
         """Format content as bullet points"""
         return [f"• {point}" for point in content if point.strip()]
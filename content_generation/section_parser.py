@@ -0,0 +1,146 @@
+# Lógica para convertir la salida del LLM en secciones a medida que llega
+
+import re
+import time
+from typing import List, Optional
+
+from content_generation.slide_content import SlideContent
+
+# "Sección 1 - Título", "Seccion 2: Título", "**Sección 3 – Título**"
+SECTION_HEADER = re.compile(r'^[\s*#]*Secci[oó]n\s+(\d+)\s*[-–—:.]?\s*(.*?)[\s*]*$', re.IGNORECASE)
+CONTENT_PREFIX = re.compile(r'^\s*Contenido(?:\s+detallado)?\s*:\s*', re.IGNORECASE)
+BULLET_PREFIX = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+
+
+class SectionStreamParser:
+    """Incrementally parse "Sección N - ..." blocks from a stream of text
+
+    With max_sections set, the parser reports done once that many sections are
+    complete and ignores any further text, so the caller can stop decoding;
+    complete additionally requires that none of them came out empty. The last
+    section ends at the next header, at close(), or as soon as it has
+    expected_points points (when given); blank lines never end it.
+    """
+
+    def __init__(self, max_sections: Optional[int] = None, expected_points: Optional[int] = None):
+        self.max_sections = max_sections
+        self.expected_points = expected_points
+        self.emitted = 0
+        self.empty_sections = 0
+        # Tiempo total dedicado a parsear (para las métricas por etapa)
+        self.parse_seconds = 0.0
+        self._buffer = ''
+        self._title: Optional[str] = None
+        self._lines: List[str] = []
+        # Puntos de la sección en curso ("Contenido detallado:" solo no cuenta)
+        self._points = 0
+
+    @property
+    def done(self) -> bool:
+        return self.max_sections is not None and self.emitted >= self.max_sections
+
+    @property
+    def complete(self) -> bool:
+        return self.done and self.empty_sections == 0
+
+    def feed(self, text: str) -> List[SlideContent]:
+        """Consume a chunk of text and return the sections completed by it"""
+        start = time.perf_counter()
+        self._buffer += text
+        completed = []
+        while '\n' in self._buffer and not self.done:
+            line, self._buffer = self._buffer.split('\n', 1)
+            slide = self._consume_line(line)
+            if slide:
+                completed.append(slide)
+        self.parse_seconds += time.perf_counter() - start
+        return completed
+
+    def close(self) -> List[SlideContent]:
+        """Flush the pending line and the section in progress"""
+        completed = []
+        if self.done:
+            return completed
+        if self._buffer:
+            slide = self._consume_line(self._buffer)
+            self._buffer = ''
+            if slide:
+                completed.append(slide)
+        slide = self._finish_section()
+        if slide:
+            completed.append(slide)
+        return completed
+
+    def _consume_line(self, line: str) -> Optional[SlideContent]:
+        line = line.strip()
+        if not line:
+            # Los puntos pueden ir separados por líneas en blanco: no cierran la sección
+            return None
+
+        match = SECTION_HEADER.match(line)
+        if match:
+            completed = self._finish_section()
+            if self.done:
+                return completed
+            title = match.group(2).strip().strip('[]').strip()
+            self._title = title or f"Sección {match.group(1)}"
+            self._lines = []
+            self._points = 0
+            return completed
+
+        # El texto previo a la primera sección se descarta
+        if self._title is not None:
+            self._lines.append(line)
+            self._points += len(split_points([line]))
+            # La última sección pedida se cierra al tener sus puntos, sin esperar a la cabecera siguiente
+            if self._is_last_section() and self.expected_points and self._points >= self.expected_points:
+                return self._finish_section()
+        return None
+
+    def _is_last_section(self) -> bool:
+        return self.max_sections is not None and self.emitted == self.max_sections - 1
+
+    def _finish_section(self) -> Optional[SlideContent]:
+        if self._title is None:
+            return None
+        slide = SlideContent(title=self._title, content=split_points(self._lines))
+        self._title = None
+        self._lines = []
+        self._points = 0
+        self.emitted += 1
+        if not slide.content:
+            self.empty_sections += 1
+        return slide
+
+
+def parse_outline(text: str) -> List[str]:
+    """Extract section titles from a numbered/bulleted outline"""
+    listed, loose = [], []
+    for line in text.splitlines():
+        match = SECTION_HEADER.match(line)
+        if match:
+            title, target = match.group(2), listed
+        elif BULLET_PREFIX.match(line):
+            title, target = BULLET_PREFIX.sub('', line), listed
+        else:
+            title, target = line, loose
+        title = title.strip().strip('*[]"').strip()
+        if title:
+            target.append(title)
+    # Si hay lista, se ignoran las frases sueltas ("Aquí tienes el esquema:")
+    return listed or loose
+
+
+def split_points(lines: List[str]) -> List[str]:
+    """Split section body lines into short bullet points"""
+    points = []
+    for line in lines:
+        line = BULLET_PREFIX.sub('', CONTENT_PREFIX.sub('', line)).strip()
+        if not line:
+            continue
+        # "Punto uno. Punto dos. Punto tres." -> tres puntos
+        for sentence in re.split(r'(?<=[.!?])\s+', line):
+            sentence = sentence.strip()
+            if sentence:
+                points.append(sentence)
+    return points
@@ -0,0 +1,36 @@
+# Modelo de datos de una diapositiva generada
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+@dataclass
+class SlideContent:
+    """Represents the content of a single slide"""
+    title: str
+    content: List[str]
+    notes: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        """Convert SlideContent to dictionary"""
+        return {
+            'title': self.title,
+            'content': self.content,
+            'notes': self.notes
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SlideContent':
+        """Create SlideContent from dictionary"""
+        return cls(
+            title=data.get('title', ''),
+            content=data.get('content', []),
+            notes=data.get('notes', '')
+        )
+
+    def __str__(self) -> str:
+        """String representation for debugging"""
+        return f"SlideContent(title='{self.title}', content={self.content}, notes='{self.notes}')"
+    
+    def format_bullet_points(self, content: List[str]) -> List[str]:
+        """Format content as bullet points"""
+        return [f"• {point}" for point in content if point.strip()]
@@ -1,7 +1,10 @@
 # Lógica para manejar la gestión de documentos
 
+import hashlib
 import os
-from typing import List, Optional
+import threading
+import uuid
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -12,10 +15,32 @@ class Document:
     created_at: datetime
     format: str
     size: int
+    content_hash: Optional[str] = None
+
+# Contenido aceptado por save_document
+ContentSource = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
+CHUNK_SIZE = 1024 * 1024
 
 class DocumentHandler:
+    """Stores generated documents and keeps an in-memory index of them
+
+    The index (filename -> Document per directory) is built once with
+    os.scandir, updated on save/delete and rebuilt for a directory only when
+    its mtime changes, so lookups do not touch the filesystem listing.
+    """
+
+    DOCUMENT_DIRS = ('presentations', 'pdfs')
+
     def __init__(self, base_dir: str):
         self.base_dir = base_dir
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Document]] = {name: {} for name in self.DOCUMENT_DIRS}
+        self._dir_mtimes: Dict[str, Optional[int]] = {name: None for name in self.DOCUMENT_DIRS}
+        self._sorted: Optional[List[Document]] = None
+        # Hash de contenido -> rutas con ese contenido, para deduplicar con hard links
+        self._by_hash: Dict[str, Set[str]] = {}
+        # Ruta -> (tamaño, mtime) cuando se registró su hash; si cambia, el hash se recalcula
+        self._signatures: Dict[str, Tuple[int, int]] = {}
         self._ensure_directories()
     
     def _ensure_directories(self) -> None:
@@ -24,8 +49,34 @@ class DocumentHandler:
             dir_path = os.path.join(self.base_dir, dir_name)
             os.makedirs(dir_path, exist_ok=True)
     
-    def save_document(self, content: bytes, filename: str, format: str) -> Document:
-        """Save a document to the appropriate directory"""
+    def save_document(self, content: ContentSource, filename: str, format: str) -> Document:
+        """Save a document, streaming bytes, a file-like object or an iterator of chunks"""
+        tmp_path = self.temp_path(filename)
+        try:
+            content_hash = hashlib.sha256()
+            size = 0
+            # Se escribe por bloques en un temporal del mismo disco y se renombra al final
+            with open(tmp_path, 'wb') as f:
+                for chunk in _iter_chunks(content):
+                    content_hash.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return self._commit(tmp_path, filename, format, content_hash.hexdigest(), size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def import_file(self, source_path: str, filename: str, format: str) -> Document:
+        """Move an already written file (e.g. from temp_path) into the store without copying it"""
+        return self._commit(source_path, filename, format, _file_hash(source_path),
+                            os.path.getsize(source_path))
+
+    def temp_path(self, filename: str) -> str:
+        """Unique scratch path on the same filesystem as the documents"""
+        return os.path.join(self.base_dir, 'temp', f"{uuid.uuid4().hex}-{os.path.basename(filename)}")
+
+    def _commit(self, tmp_path: str, filename: str, format: str, content_hash: str, size: int) -> Document:
+        """Atomically publish tmp_path, hard-linking to an identical document when one exists"""
         # Normalize format and determine directory
         format = format.lower()
         dir_name = 'presentations' if format == 'pptx' else 'pdfs'
@@ -37,58 +88,189 @@ class DocumentHandler:
         # Create full path
         file_path = os.path.join(self.base_dir, dir_name, filename)
         
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(content)
-        
-        # Create and return document metadata
-        return Document(
-            filename=filename,
-            path=file_path,
-            created_at=datetime.now(),
-            format=format,
-            size=os.path.getsize(file_path)
-        )
-    
-    def list_documents(self, format: Optional[str] = None) -> List[Document]:
-        """List all documents, optionally filtered by format"""
-        documents = []
-        
-        for dir_name in ['presentations', 'pdfs']:
-            dir_path = os.path.join(self.base_dir, dir_name)
-            if not os.path.exists(dir_path):
-                continue
+        with self._lock:
+            self._refresh(dir_name)
+            mtime_before = self._dir_mtime(dir_name)
+
+            previous = self._index[dir_name].get(filename)
+            if previous:
+                self._forget_hash(previous)
+
+            duplicates = [path for path in self._by_hash.get(content_hash, ()) if path != file_path]
+            if not any(self._link_duplicate(path, content_hash, size, file_path) for path in duplicates):
+                os.replace(tmp_path, file_path)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._by_hash.setdefault(content_hash, set()).add(file_path)
+            stat = os.stat(file_path)
+            self._signatures[file_path] = (stat.st_size, stat.st_mtime_ns)
             
-            for filename in os.listdir(dir_path):
-                file_format = filename.split('.')[-1].lower()
-                if format and file_format != format.lower():
-                    continue
-                
-                file_path = os.path.join(dir_path, filename)
-                documents.append(Document(
-                    filename=filename,
-                    path=file_path,
-                    created_at=datetime.fromtimestamp(os.path.getctime(file_path)),
-                    format=file_format,
-                    size=os.path.getsize(file_path)
-                ))
-        
-        return sorted(documents, key=lambda x: x.created_at, reverse=True)
+            # Create and return document metadata
+            document = Document(
+                filename=filename,
+                path=file_path,
+                created_at=datetime.now(),
+                format=format,
+                size=size,
+                content_hash=content_hash
+            )
+            self._index[dir_name][filename] = document
+            self._sorted = None
+            self._mark_fresh(dir_name, mtime_before)
+        return document
+
+    def _forget_hash(self, doc: Document) -> None:
+        self._forget_path(doc.content_hash, doc.path)
+
+    def _forget_path(self, content_hash: Optional[str], path: str) -> None:
+        self._signatures.pop(path, None)
+        paths = self._by_hash.get(content_hash)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del self._by_hash[content_hash]
+
+    def _link_duplicate(self, duplicate: str, content_hash: str, size: int, file_path: str) -> bool:
+        """Point file_path at an existing identical file via a hard link"""
+        try:
+            if not self._has_content(duplicate, content_hash, size):
+                # Modificado o sustituido fuera de aquí: deja de ser candidato
+                self._forget_path(content_hash, duplicate)
+                return False
+            if os.path.exists(file_path) and os.path.samefile(duplicate, file_path):
+                # Ya es un hard link al mismo contenido (renombrar sobre sí mismo no haría nada)
+                return True
+            link_path = self.temp_path(os.path.basename(file_path))
+            os.link(duplicate, link_path)
+            try:
+                os.replace(link_path, file_path)
+            finally:
+                if os.path.exists(link_path):
+                    os.remove(link_path)
+            return True
+        except OSError:
+            # Original borrado o sistema de ficheros sin hard links: se guarda la copia
+            return False
+
+    def _has_content(self, path: str, content_hash: str, size: int) -> bool:
+        """True if path still holds the content registered under content_hash"""
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return False
+        if self._signatures.get(path) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        if _file_hash(path) != content_hash:
+            return False
+        self._signatures[path] = (stat.st_size, stat.st_mtime_ns)
+        return True
+    
+    def list_documents(self, format: Optional[str] = None, offset: int = 0,
+                       limit: Optional[int] = None, name_contains: Optional[str] = None) -> List[Document]:
+        """List documents newest first, optionally filtered by format/name and paginated"""
+        with self._lock:
+            self._refresh()
+            if self._sorted is None:
+                self._sorted = sorted(
+                    (doc for docs in self._index.values() for doc in docs.values()),
+                    key=lambda x: x.created_at, reverse=True
+                )
+            documents = self._sorted
+
+        if format or name_contains:
+            format = format.lower() if format else None
+            needle = name_contains.lower() if name_contains else None
+            documents = [
+                doc for doc in documents
+                if (not format or doc.format == format)
+                and (not needle or needle in doc.filename.lower())
+            ]
+        end = None if limit is None else offset + limit
+        return documents[offset:end]
     
     def get_document(self, filename: str) -> Optional[Document]:
         """Retrieve a specific document by filename"""
-        for doc in self.list_documents():
-            if doc.filename == filename:
-                return doc
-        return None
+        with self._lock:
+            self._refresh()
+            matches = [docs[filename] for docs in self._index.values() if filename in docs]
+        if not matches:
+            return None
+        return max(matches, key=lambda x: x.created_at)
     
     def delete_document(self, filename: str) -> bool:
         """Delete a document by filename"""
-        doc = self.get_document(filename)
-        if doc and os.path.exists(doc.path):
-            os.remove(doc.path)
+        with self._lock:
+            doc = self.get_document(filename)
+            if not doc:
+                return False
+            dir_name = os.path.basename(os.path.dirname(doc.path))
+            mtime_before = self._dir_mtime(dir_name)
+            self._index[dir_name].pop(filename, None)
+            self._forget_hash(doc)
+            self._sorted = None
+            try:
+                os.remove(doc.path)
+            except FileNotFoundError:
+                return False
+            finally:
+                self._mark_fresh(dir_name, mtime_before)
             return True
-        return False
+
+    def _dir_mtime(self, dir_name: str) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.base_dir, dir_name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _mark_fresh(self, dir_name: str, mtime_before: Optional[int]) -> None:
+        # Si nadie más tocó el directorio, el índice sigue siendo válido tras nuestro cambio
+        if self._dir_mtimes[dir_name] == mtime_before:
+            self._dir_mtimes[dir_name] = self._dir_mtime(dir_name)
+
+    def _refresh(self, *dir_names: str) -> None:
+        """Rescan the directories whose mtime changed since they were indexed"""
+        for dir_name in dir_names or self.DOCUMENT_DIRS:
+            mtime = self._dir_mtime(dir_name)
+            if mtime is not None and mtime == self._dir_mtimes[dir_name]:
+                continue
+            self._index[dir_name] = self._scan(dir_name)
+            self._dir_mtimes[dir_name] = mtime
+            self._sorted = None
+
+    def _scan(self, dir_name: str) -> Dict[str, Document]:
+        dir_path = os.path.join(self.base_dir, dir_name)
+        documents = {}
+        if not os.path.exists(dir_path):
+            return documents
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                documents[entry.name] = Document(
+                    filename=entry.name,
+                    path=entry.path,
+                    created_at=datetime.fromtimestamp(stat.st_ctime),
+                    format=entry.name.split('.')[-1].lower(),
+                    size=stat.st_size
+                )
+        return documents
+
+def _file_hash(path: str) -> str:
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+def _iter_chunks(content: ContentSource) -> Iterator[bytes]:
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        yield content
+    elif hasattr(content, 'read'):
+        for chunk in iter(lambda: content.read(CHUNK_SIZE), b''):
+            yield chunk
+    else:
+        for chunk in content:
+            yield chunk
 
 def manage_documents():
     # Aquí irá el código para gestionar los documentos
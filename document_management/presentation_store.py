@@ -0,0 +1,157 @@
+# Repositorio de presentaciones generadas (SQLite)
+
+import base64
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class PresentationStore:
+    """SQLite-backed presentation repository with indexed lookup and keyset pagination
+
+    Every write is a single transaction, so readers never see a half-written
+    deck. Legacy {id}.json files found in legacy_dir are imported once.
+    """
+
+    def __init__(self, db_path: str, legacy_dir: Optional[str] = None):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS presentations (
+                    id TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL DEFAULT '',
+                    topic_norm TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+                    created_at REAL NOT NULL,
+                    slide_count INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_presentations_created "
+                         "ON presentations (created_at, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_presentations_topic "
+                         "ON presentations (topic_norm, created_at, id)")
+        if legacy_dir:
+            self._import_legacy(legacy_dir)
+
+    def save(self, presentation_data: Dict, created_at: Optional[float] = None) -> Dict:
+        """Insert or replace a presentation atomically"""
+        presentation_id = presentation_data['id']
+        topic = presentation_data.get('topic', '') or ''
+        with self._conn() as conn:
+            row = conn.execute("SELECT created_at FROM presentations WHERE id = ?",
+                               (presentation_id,)).fetchone()
+            if created_at is None:
+                created_at = row[0] if row else time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO presentations (id, topic, topic_norm, created_at, slide_count, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (presentation_id, topic, topic.strip().lower(), created_at,
+                 len(presentation_data.get('slides', [])),
+                 json.dumps(presentation_data, ensure_ascii=False))
+            )
+        return presentation_data
+
+    def get(self, presentation_id: str) -> Optional[Dict]:
+        """Return the presentation JSON by id, or None"""
+        row = self._conn().execute("SELECT data FROM presentations WHERE id = ?",
+                                   (presentation_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, presentation_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM presentations WHERE id = ?",
+                                    (presentation_id,)).fetchone() is not None
+
+    def delete(self, presentation_id: str) -> bool:
+        with self._conn() as conn:
+            cursor = conn.execute("DELETE FROM presentations WHERE id = ?", (presentation_id,))
+        return cursor.rowcount > 0
+
+    def list(self, limit: int = 20, cursor: Optional[str] = None,
+             topic: Optional[str] = None) -> Dict:
+        """List presentation summaries, newest first
+
+        topic filters by topic prefix (case-insensitive). Pagination is
+        keyset-based: pass the returned next_cursor to get the next page, so
+        each page costs an index seek regardless of how deep it is.
+        """
+        limit = max(1, min(int(limit), 100))
+        where: List[str] = []
+        params: List = []
+        if topic:
+            where.append("topic_norm LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(topic.strip().lower()) + '%')
+        if cursor:
+            created_at, last_id = _decode_cursor(cursor)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, last_id])
+
+        sql = "SELECT id, topic, created_at, slide_count FROM presentations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        items = [
+            {'id': row[0], 'topic': row[1], 'created_at': row[2], 'slide_count': row[3]}
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = _encode_cursor(last['created_at'], last['id'])
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM presentations").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión por hilo (Flask y los workers de la cola de trabajos)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy(self, legacy_dir: str) -> None:
+        """Import {id}.json files written before the store existed"""
+        paths = glob.glob(os.path.join(legacy_dir, '*.json'))
+        if not paths or self.count() > 0:
+            return
+        print(f"Importando {len(paths)} presentaciones existentes...")
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"No se pudo importar {path}: {str(e)}")
+                continue
+            if not isinstance(data, dict):
+                data = {'slides': data if isinstance(data, list) else []}
+            data.setdefault('id', os.path.splitext(os.path.basename(path))[0])
+            self.save(data, created_at=os.path.getmtime(path))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _encode_cursor(created_at: float, presentation_id: str) -> str:
+    raw = json.dumps([created_at, presentation_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, presentation_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(created_at), str(presentation_id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor de paginación inválido")
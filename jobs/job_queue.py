@@ -0,0 +1,137 @@
+# Lógica para ejecutar trabajos de generación en segundo plano
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+class JobQueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+
+@dataclass
+class Job:
+    """Represents a background job and its progress"""
+    id: str
+    kind: str = 'generate'
+    status: str = 'queued'      # queued | running | completed | failed
+    stage: str = 'queued'
+    progress: float = 0.0
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Estado por elemento en trabajos con varios temas (p.ej. generación por lotes)
+    items: Optional[List[Dict]] = None
+
+    def set_progress(self, stage: str, progress: Optional[float] = None) -> None:
+        """Update the current stage and, optionally, the completion ratio (0-1)"""
+        self.stage = stage
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self) -> Dict:
+        """Convert Job to dictionary"""
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.items is not None:
+            data['items'] = [dict(item) for item in self.items]
+        if self.status == 'completed':
+            data['result'] = self.result
+        if self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool that runs jobs and keeps their status pollable"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, max_finished: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='job-worker')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, func: Callable[[Job], Any], kind: str = 'generate') -> Job:
+        """Enqueue func(job) and return the job immediately"""
+        with self._lock:
+            if self._count('queued') >= self.max_pending:
+                raise JobQueueFullError("Demasiados trabajos en cola")
+            job = Job(id=job_id, kind=kind)
+            self._jobs[job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with the given id, if known"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Job]:
+        """Return known jobs, newest first, optionally filtered by status"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if not status or job.status == status]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def stats(self) -> Dict:
+        """Return counters of jobs per status"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queued': self._count('queued'),
+                'running': self._count('running'),
+                'completed': self._count('completed'),
+                'failed': self._count('failed'),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> None:
+        job.status = 'running'
+        job.started_at = time.time()
+        job.set_progress('running')
+        try:
+            job.result = func(job)
+            job.status = 'completed'
+            job.set_progress('done', 1.0)
+        except Exception as e:
+            print(f"Error en trabajo {job.id}: {str(e)}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'failed'
+            job.set_progress('failed')
+        finally:
+            job.finished_at = time.time()
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs once max_finished is exceeded"""
+        finished = [job for job in self._jobs.values() if job.finished]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished]:
+            del self._jobs[job.id]
@@ -0,0 +1,269 @@
+# Backends de exportación a PDF
+
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from io import BytesIO
+from typing import Dict, List
+
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+# Tamaño de diapositiva 16:9
+PAGE_SIZE = (13.333 * inch, 7.5 * inch)
+MARGIN = 0.75 * inch
+
+
+class PDFBackend:
+    """Base class: render slide JSON to PDF bytes and/or convert a .pptx file"""
+
+    # True si el backend puede ejecutarse en un pool de procesos
+    process_safe = True
+
+    def render(self, presentation_data: Dict) -> bytes:
+        raise NotImplementedError
+
+    def convert_pptx(self, pptx_path: str, pdf_path: str) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ReportLabBackend(PDFBackend):
+    """Pure-Python backend: draws slide titles and bullet points with reportlab"""
+
+    def __init__(self, title_font: str = 'Helvetica-Bold', body_font: str = 'Helvetica'):
+        self.title_font = title_font
+        self.body_font = body_font
+
+    def render(self, presentation_data: Dict) -> bytes:
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+        pdf.setTitle(presentation_data.get('topic') or 'Presentación')
+
+        self._draw_title_page(pdf, presentation_data.get('topic') or 'Presentación')
+        for slide in presentation_data.get('slides', []):
+            content = slide.get('content', [])
+            if not isinstance(content, list):
+                content = [content]
+            self._draw_slide(pdf, slide.get('title', ''), content)
+
+        pdf.save()
+        return buffer.getvalue()
+
+    def convert_pptx(self, pptx_path: str, pdf_path: str) -> bool:
+        """Render the text of a .pptx (titles and bullets) to PDF"""
+        try:
+            with open(pdf_path, 'wb') as f:
+                f.write(self.render(pptx_to_presentation_data(pptx_path)))
+            return True
+        except Exception as e:
+            print(f"Error converting PPTX to PDF: {str(e)}")
+            return False
+
+    def _draw_title_page(self, pdf, title: str) -> None:
+        width, height = PAGE_SIZE
+        pdf.setFont(self.title_font, 40)
+        lines = simpleSplit(title, self.title_font, 40, width - 2 * MARGIN)
+        y = height / 2 + (len(lines) - 1) * 24
+        for line in lines:
+            pdf.drawCentredString(width / 2, y, line)
+            y -= 48
+        pdf.showPage()
+
+    def _draw_slide(self, pdf, title: str, content: List[str]) -> None:
+        width, height = PAGE_SIZE
+        text_width = width - 2 * MARGIN
+        y = height - MARGIN - 28
+
+        pdf.setFont(self.title_font, 30)
+        for line in simpleSplit(title, self.title_font, 30, text_width):
+            pdf.drawString(MARGIN, y, line)
+            y -= 36
+        y -= 12
+
+        pdf.setFont(self.body_font, 20)
+        for point in content:
+            point = str(point).strip()
+            if not point:
+                continue
+            lines = simpleSplit(point, self.body_font, 20, text_width - 0.4 * inch)
+            for i, line in enumerate(lines):
+                if y < MARGIN:
+                    # El contenido que no cabe continúa en otra página
+                    pdf.showPage()
+                    pdf.setFont(self.body_font, 20)
+                    y = height - MARGIN - 20
+                if i == 0:
+                    pdf.drawString(MARGIN, y, '•')
+                pdf.drawString(MARGIN + 0.4 * inch, y, line)
+                y -= 28
+            y -= 8
+        pdf.showPage()
+
+
+class PPTXConversionBackend(PDFBackend):
+    """Backend that renders slide JSON through a .pptx, keeping the template layout"""
+
+    process_safe = False
+    _pptx_renderer = None
+
+    def render(self, presentation_data: Dict) -> bytes:
+        from template.pptx_renderer import PPTXRenderer
+
+        if self._pptx_renderer is None:
+            self._pptx_renderer = PPTXRenderer()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pptx_path = os.path.join(tmp_dir, 'presentation.pptx')
+            pdf_path = os.path.join(tmp_dir, 'presentation.pdf')
+            with open(pptx_path, 'wb') as f:
+                f.write(self._pptx_renderer.render_bytes(presentation_data))
+            if not self.convert_pptx(pptx_path, pdf_path):
+                raise RuntimeError(f"{type(self).__name__} no pudo convertir la presentación")
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+
+
+class SofficePoolBackend(PPTXConversionBackend):
+    """Pool of long-lived headless LibreOffice (unoserver) processes
+
+    Each process keeps LibreOffice loaded and gets its own profile, so
+    conversions run concurrently without a per-call application launch.
+    Requires LibreOffice and the 'unoserver' package.
+    """
+
+    def __init__(self, size: int = 2, base_port: int = 2003, start_timeout: float = 30):
+        from unoserver.client import UnoClient
+
+        if not shutil.which('unoserver'):
+            raise RuntimeError("unoserver no está instalado")
+        self._client_class = UnoClient
+        self._ports: 'queue.Queue' = queue.Queue()
+        self._processes = []
+        self._profiles = []
+        try:
+            for i in range(size):
+                port = base_port + 2 * i
+                profile = tempfile.mkdtemp(prefix=f'lo_profile_{i}_')
+                self._profiles.append(profile)
+                process = subprocess.Popen(
+                    ['unoserver', '--interface', '127.0.0.1', '--port', str(port),
+                     '--uno-port', str(port + 1), '--user-installation', f'file://{profile}'],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                self._processes.append(process)
+                _wait_for_port(port, start_timeout)
+                self._ports.put(port)
+        except BaseException:
+            # Nadie conservará este objeto: se paran los procesos ya lanzados y se borran sus perfiles
+            self.close()
+            raise
+
+    def convert_pptx(self, pptx_path: str, pdf_path: str) -> bool:
+        port = self._ports.get()
+        try:
+            client = self._client_class(server='127.0.0.1', port=str(port))
+            client.convert(inpath=os.path.abspath(pptx_path), outpath=os.path.abspath(pdf_path),
+                           convert_to='pdf')
+            return True
+        except Exception as e:
+            print(f"Error converting PPTX to PDF: {str(e)}")
+            return False
+        finally:
+            self._ports.put(port)
+
+    def close(self) -> None:
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for profile in self._profiles:
+            shutil.rmtree(profile, ignore_errors=True)
+
+
+class PowerPointBackend(PPTXConversionBackend):
+    """PowerPoint COM automation (Windows only)"""
+
+    def convert_pptx(self, pptx_path: str, pdf_path: str) -> bool:
+        import pythoncom
+        import win32com.client
+
+        try:
+            pythoncom.CoInitialize()
+            powerpoint = win32com.client.Dispatch("Powerpoint.Application")
+            powerpoint.Visible = True
+
+            # Open presentation
+            presentation = powerpoint.Presentations.Open(pptx_path)
+
+            # Save as PDF
+            presentation.SaveAs(pdf_path, 32)  # 32 is the PDF format number
+
+            # Close
+            presentation.Close()
+            powerpoint.Quit()
+
+            return True
+        except Exception as e:
+            print(f"Error converting PPTX to PDF: {str(e)}")
+            return False
+        finally:
+            pythoncom.CoUninitialize()
+
+
+def create_backend(name: str = 'reportlab', **kwargs) -> PDFBackend:
+    """Build a backend by name: reportlab, soffice or powerpoint"""
+    backends = {
+        'reportlab': ReportLabBackend,
+        'soffice': SofficePoolBackend,
+        'powerpoint': PowerPointBackend,
+    }
+    if name not in backends:
+        raise ValueError(f"Backend PDF desconocido: {name}")
+    return backends[name](**kwargs)
+
+
+def pptx_to_presentation_data(pptx_path: str) -> Dict:
+    """Extract titles, text and notes of a .pptx into the slide JSON format"""
+    from pptx import Presentation
+
+    presentation = Presentation(pptx_path)
+    slides = []
+    for slide in presentation.slides:
+        title_shape = slide.shapes.title
+        content = []
+        for shape in slide.shapes:
+            if not shape.has_text_frame:
+                continue
+            if title_shape is not None and shape.shape_id == title_shape.shape_id:
+                continue
+            content.extend(p.text for p in shape.text_frame.paragraphs if p.text.strip())
+        notes = None
+        if slide.has_notes_slide:
+            notes = slide.notes_slide.notes_text_frame.text or None
+        slides.append({
+            'title': title_shape.text if title_shape is not None else '',
+            'content': content,
+            'notes': notes
+        })
+    return {'topic': os.path.splitext(os.path.basename(pptx_path))[0], 'slides': slides}
+
+
+def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"unoserver no respondió en el puerto {port}")
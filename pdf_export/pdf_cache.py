@@ -0,0 +1,145 @@
+# Caché de PDFs generados, direccionada por contenido
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Tuple
+
+
+class PDFCache:
+    """Directory of rendered PDFs keyed by a hash of the presentation and template
+
+    Concurrent requests for the same key share a single render (single-flight)
+    and the directory is kept under max_bytes by evicting least recently used
+    files. File mtimes are left untouched so they can serve as Last-Modified.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, template_version: str = ''):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.template_version = template_version
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._errors: Dict[str, Exception] = {}
+        self._access: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared_renders = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._bytes = 0
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                self._bytes += stat.st_size
+                self._access[entry.name[:-4]] = stat.st_mtime
+
+    def key_for(self, presentation_data: Dict) -> str:
+        """Hash of the presentation JSON plus the template version"""
+        payload = json.dumps(presentation_data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{self.template_version}\0{payload}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> str:
+        """Return the cached PDF path, rendering it once if missing"""
+        path = self.path_for(key)
+        while True:
+            with self._lock:
+                if os.path.exists(path):
+                    self.hits += 1
+                    self._access[key] = time.time()
+                    return path
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self.misses += 1
+                else:
+                    self.shared_renders += 1
+
+            if not leader:
+                # Otra petición ya está generando este PDF: se espera su resultado
+                event.wait()
+                with self._lock:
+                    error = self._errors.get(key)
+                if error is not None:
+                    raise error
+                if os.path.exists(path):
+                    return path
+                continue
+
+            try:
+                self._store(key, render())
+                with self._lock:
+                    self._errors.pop(key, None)
+                return path
+            except Exception as e:
+                with self._lock:
+                    self._errors[key] = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def open(self, key: str, render: Callable[[], bytes]) -> Tuple[BinaryIO, float]:
+        """Open the cached PDF (rendering it if needed) and return (file, mtime)
+
+        The file is opened under the lock, so a concurrent eviction can no longer
+        remove it between the lookup and the response: the open handle stays valid.
+        """
+        while True:
+            path = self.get_or_render(key, render)
+            with self._lock:
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    # Expulsado justo después de generarse: se vuelve a generar
+                    continue
+            return f, os.fstat(f.fileno()).st_mtime
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_renders': self.shared_renders,
+                'evictions': self.evictions,
+                'files': len(self._access),
+                'bytes': self._bytes,
+            }
+
+    def _store(self, key: str, pdf_bytes: bytes) -> None:
+        path = self.path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += len(pdf_bytes)
+            self._access[key] = time.time()
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used PDFs until the directory fits max_bytes"""
+        for key in sorted(self._access, key=self._access.get):
+            if self._bytes <= self.max_bytes or len(self._access) <= 1:
+                break
+            path = self.path_for(key)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                size = 0
+            except OSError:
+                # Abierto en otro proceso (Windows): se intenta en la próxima expulsión
+                continue
+            self._bytes -= size
+            del self._access[key]
+            self.evictions += 1
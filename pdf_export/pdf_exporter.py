@@ -1,38 +1,25 @@
 # Lógica para convertir la presentación a PDF
 
 import os
-from typing import Optional
-import win32com.client
-import pythoncom
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from document_management.document_handler import Document, DocumentHandler
+from pdf_export.backends import PDFBackend, ReportLabBackend
 
 class PDFExporter:
-    def __init__(self, document_handler: DocumentHandler):
+    def __init__(self, document_handler: DocumentHandler,
+                 backend: Optional[PDFBackend] = None, max_workers: int = 2):
         self.document_handler = document_handler
+        self.backend = backend or ReportLabBackend()
+        self.max_workers = max_workers
+        # Pool de larga duración para render_many (se crea en el primer lote)
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
     
     def _pptx_to_pdf(self, pptx_path: str, pdf_path: str) -> bool:
-        """Convert PPTX to PDF using PowerPoint COM automation"""
-        try:
-            pythoncom.CoInitialize()
-            powerpoint = win32com.client.Dispatch("Powerpoint.Application")
-            powerpoint.Visible = True
-            
-            # Open presentation
-            presentation = powerpoint.Presentations.Open(pptx_path)
-            
-            # Save as PDF
-            presentation.SaveAs(pdf_path, 32)  # 32 is the PDF format number
-            
-            # Close
-            presentation.Close()
-            powerpoint.Quit()
-            
-            return True
-        except Exception as e:
-            print(f"Error converting PPTX to PDF: {str(e)}")
-            return False
-        finally:
-            pythoncom.CoUninitialize()
+        """Convert PPTX to PDF using the configured backend"""
+        return self.backend.convert_pptx(pptx_path, pdf_path)
     
     def export_to_pdf(self, presentation_filename: str) -> Optional[Document]:
         """Export a presentation to PDF"""
@@ -43,18 +30,59 @@ class PDFExporter:
         
         # Create PDF filename
         pdf_filename = os.path.splitext(presentation_filename)[0] + '.pdf'
-        pdf_path = os.path.join(self.document_handler.base_dir, 'pdfs', pdf_filename)
         
-        # Convert to PDF
-        if self._pptx_to_pdf(pres_doc.path, pdf_path):
-            # Create PDF document entry
-            with open(pdf_path, 'rb') as f:
-                pdf_content = f.read()
-            
-            return self.document_handler.save_document(
-                content=pdf_content,
-                filename=pdf_filename,
-                format='pdf'
-            )
+        # El backend escribe en un temporal que luego se mueve (sin releerlo ni reescribirlo)
+        tmp_path = self.document_handler.temp_path(pdf_filename)
+        try:
+            if self._pptx_to_pdf(pres_doc.path, tmp_path):
+                return self.document_handler.import_file(tmp_path, pdf_filename, 'pdf')
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
         return None
+    
+    def render(self, presentation_data: Dict) -> bytes:
+        """Render slide JSON straight to PDF bytes"""
+        return self.backend.render(presentation_data)
+    
+    def export_slides(self, presentation_data: Dict, filename: str) -> Document:
+        """Render slide JSON to PDF and store it as a document"""
+        return self.document_handler.save_document(
+            content=self.render(presentation_data),
+            filename=filename,
+            format='pdf'
+        )
+    
+    def render_many(self, presentations: List[Dict]) -> List[bytes]:
+        """Render several presentations concurrently with at most max_workers in flight"""
+        if len(presentations) <= 1:
+            return [self.render(data) for data in presentations]
+        return list(self._get_executor().map(self.backend.render, presentations))
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.backend.process_safe:
+                    # Backends CPU-bound (reportlab): un proceso por worker
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    # Backends que delegan en procesos externos ya vivos: basta con hilos
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='pdf-export')
+            return self._executor
+    
+    def export_many(self, items: List[Tuple[Dict, str]]) -> List[Document]:
+        """Render (presentation_data, filename) pairs concurrently and store the PDFs"""
+        pdfs = self.render_many([data for data, _ in items])
+        return [
+            self.document_handler.save_document(content=pdf, filename=filename, format='pdf')
+            for pdf, (_, filename) in zip(pdfs, items)
+        ]
+    
+    def close(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.backend.close()
@@ -0,0 +1,176 @@
+# Lógica del chat: respuestas por recuperación y LLM solo cuando hace falta
+
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain.prompts import PromptTemplate
+
+from rag.generation_cache import GenerationCache
+from rag.inference_pool import PRIORITY_INTERACTIVE
+
+# Mensajes que piden texto nuevo (no solo información de la base de conocimiento)
+GENERATION_INTENT = re.compile(
+    r'\b(genera|generar|crea|crear|escribe|escribir|redacta|redactar|resume|resumir|'
+    r'reescribe|traduce|prop[oó]n|sugiere|compara|elabora|haz|hazme|dame ideas)\b',
+    re.IGNORECASE
+)
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class ChatHandler:
+    """Answer chat turns from retrieval alone, invoking the LLM only when a message asks for generation
+
+    The conversation history is folded into a short rolling summary (last
+    max_turns turns, each reduced to its first sentence, capped at
+    summary_chars) so the prompt stays bounded however long the chat gets.
+    """
+
+    def __init__(self, rag_handler, max_turns: int = 6, summary_chars: int = 600,
+                 answer_max_new_tokens: int = 192, answer_chars: int = 500):
+        self.rag_handler = rag_handler
+        # Longitud máxima del extracto devuelto en las respuestas por recuperación
+        self.answer_chars = answer_chars
+        self.max_turns = max_turns
+        self.summary_chars = summary_chars
+        self.answer_max_new_tokens = answer_max_new_tokens
+        self.prompt = PromptTemplate(
+            input_variables=["summary", "context", "message"],
+            template="""Eres un asistente que ayuda a preparar presentaciones. Responde en español, de forma breve.
+
+Conversación previa: {summary}
+
+Contexto útil: {context}
+
+Usuario: {message}
+Asistente:"""
+        )
+
+    def needs_generation(self, message: str) -> bool:
+        return bool(GENERATION_INTENT.search(message))
+
+    def summarize_history(self, history: Optional[List]) -> str:
+        """Bounded rolling summary of the most recent turns"""
+        lines = []
+        for turn in (history or [])[-self.max_turns:]:
+            if isinstance(turn, dict):
+                role = turn.get('role', 'user')
+                text = str(turn.get('content') or turn.get('message') or '')
+            else:
+                role, text = 'user', str(turn)
+            text = SENTENCE_END.split(text.strip(), 1)[0][:160]
+            if text:
+                lines.append(f"{'Usuario' if role == 'user' else 'Asistente'}: {text}")
+        summary = " | ".join(lines)
+        if len(summary) > self.summary_chars:
+            # Se conservan los turnos más recientes
+            summary = "..." + summary[-self.summary_chars:]
+        return summary
+
+    def respond(self, message: str, history: Optional[List] = None,
+                generate: Optional[bool] = None, priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """Answer a chat turn; generate=None decides from the message itself"""
+        summary, docs, generate = self._prepare(message, history, generate)
+        if not generate:
+            return self._retrieval_answer(docs, summary)
+
+        context = self.rag_handler.pack_context(docs)
+        cache_key = self._cache_key(summary, message, context)
+        response = self.rag_handler.generation_cache.get(cache_key)
+        if response is None:
+            response = self.rag_handler.scheduler.generate(
+                self._prompt_for(summary, context, message),
+                priority=priority, max_new_tokens=self.answer_max_new_tokens
+            ).strip()
+            self.rag_handler.generation_cache.put(cache_key, response)
+        return {'response': response, 'mode': 'generation', 'history_summary': summary}
+
+    def stream(self, message: str, history: Optional[List] = None, generate: Optional[bool] = None,
+               priority: int = PRIORITY_INTERACTIVE) -> Iterator[Tuple[str, object]]:
+        """Like respond, but yield ('token', str) while the LLM writes and ('answer', dict) at the end
+
+        Retrieval answers and cached generations produce the 'answer' event only.
+        """
+        summary, docs, generate = self._prepare(message, history, generate)
+        if not generate:
+            yield 'answer', self._retrieval_answer(docs, summary)
+            return
+
+        context = self.rag_handler.pack_context(docs)
+        cache_key = self._cache_key(summary, message, context)
+        response = self.rag_handler.generation_cache.get(cache_key)
+        if response is None:
+            tokens = []
+            stream = self.rag_handler.scheduler.stream(
+                self._prompt_for(summary, context, message),
+                priority=priority, max_new_tokens=self.answer_max_new_tokens
+            )
+            try:
+                for token in stream:
+                    tokens.append(token)
+                    yield 'token', token
+            finally:
+                # Si el cliente se desconecta se cancela la decodificación (y no se guarda nada)
+                stream.close()
+            response = "".join(tokens).strip()
+            self.rag_handler.generation_cache.put(cache_key, response)
+        yield 'answer', {'response': response, 'mode': 'generation', 'history_summary': summary}
+
+    def _prepare(self, message: str, history: Optional[List],
+                 generate: Optional[bool]) -> Tuple[str, List, bool]:
+        summary = self.summarize_history(history)
+        docs = self.rag_handler.retrieve_documents(self._retrieval_query(message, history))
+        if generate is None:
+            generate = self.needs_generation(message)
+        return summary, docs, generate
+
+    def _retrieval_answer(self, docs: List, summary: str) -> Dict:
+        """Answer with an excerpt of the best chunk plus the sources of the retrieved chunks"""
+        sources = list(dict.fromkeys(
+            doc.metadata['source'] for doc in docs if doc.metadata.get('source')
+        ))
+        excerpt = self.excerpt(docs[0].page_content) if docs else ''
+        if excerpt:
+            response = "Esto es lo más relevante que encontré:\n" + excerpt
+            if sources:
+                response += "\n\nFuentes: " + ", ".join(sources)
+        else:
+            response = "No encontré información sobre eso en la base de conocimiento."
+        return {'response': response, 'mode': 'retrieval', 'sources': sources, 'history_summary': summary}
+
+    def excerpt(self, text: str) -> str:
+        """Leading sentences of text that fit in answer_chars (hard cut only for a single long sentence)"""
+        text = " ".join(text.split())
+        if len(text) <= self.answer_chars:
+            return text
+        excerpt = ''
+        for sentence in SENTENCE_END.split(text):
+            candidate = f"{excerpt} {sentence}".strip()
+            if len(candidate) > self.answer_chars:
+                break
+            excerpt = candidate
+        return excerpt or text[:self.answer_chars].rstrip() + "..."
+
+    def _cache_key(self, summary: str, message: str, context: str) -> str:
+        config = dict(self.rag_handler.llm_config, mode='chat',
+                      max_new_tokens=self.answer_max_new_tokens)
+        return GenerationCache.make_key(f"{summary}\n{message}", context,
+                                        self.rag_handler.model_path, config)
+
+    def _prompt_for(self, summary: str, context: str, message: str) -> str:
+        return self.prompt.format(
+            summary=summary or "(ninguna)",
+            context=context if context else "No hay información específica disponible.",
+            message=message
+        )
+
+    @staticmethod
+    def _retrieval_query(message: str, history: Optional[List]) -> str:
+        """Short follow-ups ("¿y sus ventajas?") are searched together with the previous user turn"""
+        if len(message.split()) >= 4 or not history:
+            return message
+        for turn in reversed(history):
+            role = turn.get('role', 'user') if isinstance(turn, dict) else 'user'
+            text = turn.get('content') or turn.get('message') if isinstance(turn, dict) else turn
+            if role == 'user' and text and str(text).strip() != message.strip():
+                return f"{text} {message}"
+        return message
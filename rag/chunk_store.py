@@ -0,0 +1,132 @@
+# Docstore en SQLite: los fragmentos se leen bajo demanda en vez de deserializar un pickle
+
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+CHUNKS_DB = "chunks.sqlite"
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Chunk texts and metadata stored in SQLite and resolved lazily by id
+
+    Writes stay in an open transaction until commit(), which the vector store
+    save performs together with writing the FAISS index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS positions (position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents; raises ValueError for ids that already exist"""
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                for doc_id, doc in texts.items()]
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT INTO chunks (id, text, metadata) VALUES (?, ?, ?)", rows)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Tried to add ids that already exist: {str(e)}")
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]) if row[1] else {})
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+
+    def index_mapping(self) -> 'SQLiteIndexMapping':
+        """FAISS position -> doc id mapping backed by this database"""
+        return SQLiteIndexMapping(self)
+
+    def save_mapping(self, mapping) -> None:
+        """Persist an index_to_docstore_id mapping (no-op if it is already ours)"""
+        if isinstance(mapping, SQLiteIndexMapping) and mapping.store is self:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.executemany("INSERT INTO positions (position, doc_id) VALUES (?, ?)",
+                                   list(mapping.items()))
+
+    def copy_from(self, docstore: Docstore, doc_ids) -> None:
+        """Copy the given documents from another docstore"""
+        batch = {}
+        for doc_id in doc_ids:
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                batch[doc_id] = doc
+            if len(batch) >= 1000:
+                self.add(batch)
+                batch = {}
+        if batch:
+            self.add(batch)
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def execute(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+class SQLiteIndexMapping(MutableMapping):
+    """index_to_docstore_id stored in the positions table of a SQLiteDocstore"""
+
+    def __init__(self, store: SQLiteDocstore):
+        self.store = store
+
+    def __getitem__(self, position: int) -> str:
+        rows = self.store.execute("SELECT doc_id FROM positions WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __setitem__(self, position: int, doc_id: str) -> None:
+        self.store.execute("INSERT OR REPLACE INTO positions (position, doc_id) VALUES (?, ?)",
+                           (int(position), doc_id))
+
+    def __delitem__(self, position: int) -> None:
+        self.store.execute("DELETE FROM positions WHERE position = ?", (int(position),))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter([row[0] for row in self.store.execute("SELECT position FROM positions ORDER BY position")])
+
+    def __len__(self) -> int:
+        return self.store.execute("SELECT COUNT(*) FROM positions")[0][0]
+
+    def update(self, other=(), **kwargs) -> None:
+        items = list(other.items()) if hasattr(other, 'items') else list(other)
+        items += list(kwargs.items())
+        with self.store._lock:
+            self.store._conn.executemany(
+                "INSERT OR REPLACE INTO positions (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in items]
+            )
+
+    def items(self):
+        return self.store.execute("SELECT position, doc_id FROM positions ORDER BY position")
+
+    def values(self):
+        return [row[0] for row in self.store.execute("SELECT doc_id FROM positions ORDER BY position")]
@@ -0,0 +1,148 @@
+# Empaquetado del contexto recuperado dentro de un presupuesto de tokens
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+WORD = re.compile(r'\w+', re.UNICODE)
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+@dataclass
+class PackedContext:
+    """Packed context text and what it cost compared to sending every candidate"""
+    text: str
+    tokens: int
+    candidate_tokens: int
+    chunks_used: int
+    chunks_dropped: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.candidate_tokens - self.tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~3 characters per token in Spanish) until the model tokenizer is loaded"""
+    return len(text) // 3 + 1
+
+
+class ContextPacker:
+    """Fill a token budget with relevant, non-redundant chunks (MMR-style selection)
+
+    Candidates arrive in retrieval order. Each step picks the chunk with the
+    best mix of rank relevance and novelty with respect to what is already
+    selected (word-set Jaccard similarity), as long as it fits the remaining
+    budget. Chunks are never cut mid-sentence; token counts are memoized.
+    """
+
+    def __init__(self, token_budget: int = 384, mmr_lambda: float = 0.7,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 tokenizer_name: str = 'estimate', cache_size: int = 4096):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._counts: 'OrderedDict[str, int]' = OrderedDict()
+        self.set_counter(count_tokens, tokenizer_name)
+        self.packed = 0
+        self.tokens_packed = 0
+        self.candidate_tokens = 0
+
+    def set_counter(self, count_tokens: Callable[[str], int], tokenizer_name: str) -> None:
+        """Switch token counter (e.g. to the model tokenizer) and drop memoized counts"""
+        with self._lock:
+            self._count_tokens = count_tokens
+            self.tokenizer_name = tokenizer_name
+            self._counts.clear()
+
+    def count(self, text: str) -> int:
+        with self._lock:
+            if text in self._counts:
+                self._counts.move_to_end(text)
+                return self._counts[text]
+        tokens = self._count_tokens(text)
+        with self._lock:
+            self._counts[text] = tokens
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def pack(self, chunks: Sequence[str], token_budget: Optional[int] = None) -> PackedContext:
+        """Select chunks (in retrieval order) into a context that fits the budget"""
+        budget = token_budget or self.token_budget
+        chunks = [chunk.strip() for chunk in chunks if chunk and chunk.strip()]
+        # +1 por el salto de línea que separa los fragmentos
+        costs = [self.count(chunk) + 1 for chunk in chunks]
+        words = [set(WORD.findall(chunk.lower())) for chunk in chunks]
+        relevance = [1.0 - i / max(len(chunks), 1) for i in range(len(chunks))]
+
+        selected: List[int] = []
+        remaining = budget
+        candidates = set(range(len(chunks)))
+        while candidates:
+            best, best_score = None, None
+            for i in candidates:
+                if costs[i] > remaining:
+                    continue
+                redundancy = max((_jaccard(words[i], words[j]) for j in selected), default=0.0)
+                score = self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+                if best_score is None or score > best_score:
+                    best, best_score = i, score
+            if best is None:
+                break
+            selected.append(best)
+            candidates.discard(best)
+            remaining -= costs[best]
+
+        if not selected and chunks:
+            # Ni el mejor fragmento cabe entero: se conservan sus frases iniciales
+            text = self._trim_to_budget(chunks[0], budget)
+            parts, tokens = ([text], self.count(text)) if text else ([], 0)
+        else:
+            # Se mantiene el orden de recuperación en el texto final
+            parts = [chunks[i] for i in sorted(selected)]
+            tokens = budget - remaining
+
+        packed = PackedContext(
+            text="\n".join(parts),
+            tokens=tokens,
+            candidate_tokens=sum(costs),
+            chunks_used=len(parts),
+            chunks_dropped=len(chunks) - len(parts)
+        )
+        with self._lock:
+            self.packed += 1
+            self.tokens_packed += packed.tokens
+            self.candidate_tokens += packed.candidate_tokens
+        return packed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'tokenizer': self.tokenizer_name,
+                'token_budget': self.token_budget,
+                'packed': self.packed,
+                'tokens_packed': self.tokens_packed,
+                'candidate_tokens': self.candidate_tokens,
+                'tokens_saved': self.candidate_tokens - self.tokens_packed,
+                'avg_tokens': round(self.tokens_packed / self.packed, 1) if self.packed else 0.0,
+                'memoized_counts': len(self._counts),
+            }
+
+    def _trim_to_budget(self, text: str, budget: int) -> str:
+        kept = []
+        for sentence in SENTENCE_END.split(text):
+            candidate = " ".join(kept + [sentence])
+            if self.count(candidate) + 1 > budget:
+                break
+            kept.append(sentence)
+        return " ".join(kept)
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,237 @@
+# Backends de embeddings: sentence-transformers en torch u ONNX (int8), por lotes y con caché de consultas
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from monitoring.metrics import REGISTRY
+
+EMBEDDING_BACKENDS = ('torch', 'onnx')
+DEFAULT_EMBEDDINGS_MODEL = 'intfloat/multilingual-e5-large'
+
+# Alias cortos para probar modelos más pequeños desde variables de entorno / CLI
+MODEL_ALIASES = {
+    'e5-large': 'intfloat/multilingual-e5-large',
+    'e5-base': 'intfloat/multilingual-e5-base',
+    'e5-small': 'intfloat/multilingual-e5-small',
+    'minilm': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+}
+
+# Los modelos e5 se entrenaron con estos prefijos; sin ellos pierden calidad de recuperación
+E5_QUERY_PREFIX = 'query: '
+E5_PASSAGE_PREFIX = 'passage: '
+
+# Cuantización dinámica int8 de ONNX Runtime (avx2 funciona en casi cualquier CPU x86 actual)
+ONNX_QUANTIZATION = 'avx2'
+ONNX_QINT8_FILE = f'onnx/model_qint8_{ONNX_QUANTIZATION}.onnx'
+
+QUERY_CACHE = REGISTRY.counter(
+    'embedding_query_cache_total', 'Query embedding lookups by result', labelnames=('result',)
+)
+
+
+@dataclass
+class EmbeddingConfig:
+    """Embedding model, runtime and batching settings"""
+    model_name: str = DEFAULT_EMBEDDINGS_MODEL
+    backend: str = 'torch'
+    # int8 dinámico: quantize_dynamic en torch, modelo qint8 exportado en ONNX
+    quantize: bool = False
+    batch_size: int = 32
+    # Hilos de CPU del runtime (0 = valor por defecto)
+    threads: int = 0
+    normalize: bool = True
+    # None = automático según el modelo (e5: "query: " / "passage: ")
+    query_prefix: Optional[str] = None
+    passage_prefix: Optional[str] = None
+    query_cache_size: int = 1024
+    # Fichero ONNX concreto dentro del repositorio del modelo (p.ej. uno ya cuantizado)
+    onnx_file: Optional[str] = None
+    # Dónde guardar los modelos ONNX cuantizados exportados localmente
+    cache_folder: str = 'models/embeddings'
+
+    def __post_init__(self):
+        self.model_name = MODEL_ALIASES.get(self.model_name, self.model_name)
+        if self.backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Backend de embeddings no soportado: {self.backend}")
+        is_e5 = 'e5' in self.model_name.lower()
+        if self.query_prefix is None:
+            self.query_prefix = E5_QUERY_PREFIX if is_e5 else ''
+        if self.passage_prefix is None:
+            self.passage_prefix = E5_PASSAGE_PREFIX if is_e5 else ''
+
+    def build_params(self) -> Dict:
+        """Parameters that change the stored vectors (a change requires a rebuild)"""
+        return {
+            'model_name': self.model_name,
+            'backend': self.backend,
+            'quantize': self.quantize,
+            'onnx_file': self.onnx_file,
+            'normalize': self.normalize,
+            'passage_prefix': self.passage_prefix,
+        }
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SentenceEmbeddings(Embeddings):
+    """LangChain embeddings over sentence-transformers
+
+    Passages and queries get the model's prefixes, texts are encoded in
+    batch_size batches, and query vectors are kept in an LRU cache so
+    repeated topics skip the model entirely.
+    """
+
+    def __init__(self, config: EmbeddingConfig):
+        self.config = config
+        self.model = _load_model(config)
+        self._query_cache: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.texts_embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode([self.config.passage_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed several queries in one batch, reusing cached vectors"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._query_cache.get(text)
+                if cached is not None:
+                    self._query_cache.move_to_end(text)
+                    results[i] = list(cached)
+                else:
+                    missing.setdefault(text, []).append(i)
+            hits = len(texts) - sum(len(positions) for positions in missing.values())
+            self.cache_hits += hits
+            self.cache_misses += len(missing)
+        QUERY_CACHE.inc(hits, result='hit')
+        QUERY_CACHE.inc(len(missing), result='miss')
+
+        if missing:
+            vectors = self._encode([self.config.query_prefix + text for text in missing])
+            with self._lock:
+                for (text, positions), vector in zip(missing.items(), vectors):
+                    for i in positions:
+                        results[i] = list(vector)
+                    if self.config.query_cache_size > 0:
+                        self._query_cache[text] = vector
+                        self._query_cache.move_to_end(text)
+                while len(self._query_cache) > self.config.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return results
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.config.batch_size,
+            normalize_embeddings=self.config.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        with self._lock:
+            self.texts_embedded += len(texts)
+        return vectors.tolist()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'model_name': self.config.model_name,
+                'backend': self.config.backend,
+                'quantize': self.config.quantize,
+                'batch_size': self.config.batch_size,
+                'threads': self.config.threads,
+                'texts_embedded': self.texts_embedded,
+                'query_cache_size': len(self._query_cache),
+                'query_cache_hits': self.cache_hits,
+                'query_cache_misses': self.cache_misses,
+                'query_cache_hit_rate': round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SymmetricEmbeddings(Embeddings):
+    """Embed stored texts as queries too (for query-to-query matching like the topic index)"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_queries(self.embeddings, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+def embed_queries(embeddings: Embeddings, texts: Sequence[str]) -> List[List[float]]:
+    """Batch-embed queries with any LangChain embeddings (prefix and cache aware when supported)"""
+    embed = getattr(embeddings, 'embed_queries', None)
+    if embed is not None:
+        return embed(list(texts))
+    return embeddings.embed_documents(list(texts))
+
+
+def create_embeddings(config: Optional[EmbeddingConfig] = None) -> SentenceEmbeddings:
+    """Build the embeddings backend for a configuration"""
+    return SentenceEmbeddings(config or EmbeddingConfig())
+
+
+def _load_model(config: EmbeddingConfig):
+    from sentence_transformers import SentenceTransformer
+
+    if config.backend == 'onnx':
+        return _load_onnx_model(config)
+
+    if config.threads > 0:
+        import torch
+        torch.set_num_threads(config.threads)
+    model = SentenceTransformer(config.model_name, device='cpu')
+    if config.quantize:
+        import torch
+        # Las capas lineales pasan a int8; el resto del modelo se queda en float32
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _load_onnx_model(config: EmbeddingConfig):
+    from sentence_transformers import SentenceTransformer
+
+    model_kwargs = {'provider': 'CPUExecutionProvider'}
+    if config.threads > 0:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = config.threads
+        model_kwargs['session_options'] = options
+
+    if config.onnx_file or not config.quantize:
+        if config.onnx_file:
+            model_kwargs['file_name'] = config.onnx_file
+        return SentenceTransformer(config.model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+    # Sin fichero cuantizado publicado: se exporta una vez a cache_folder y se reutiliza
+    local_path = os.path.join(config.cache_folder, re.sub(r'[^\w.-]+', '_', config.model_name) + '-onnx')
+    if not os.path.exists(os.path.join(local_path, ONNX_QINT8_FILE)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        print(f"Exportando {config.model_name} a ONNX int8 en {local_path}...")
+        model = SentenceTransformer(config.model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+        model.save(local_path)
+        export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, local_path)
+    return SentenceTransformer(local_path, device='cpu', backend='onnx',
+                               model_kwargs=dict(model_kwargs, file_name=ONNX_QINT8_FILE))
+
@@ -0,0 +1,335 @@
+# Construcción, carga y evaluación de índices FAISS (flat / HNSW / IVF-PQ)
+
+import argparse
+import json
+import os
+import pickle
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from rag.chunk_store import CHUNKS_DB, SQLiteDocstore
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivfpq')
+
+
+@dataclass
+class IndexConfig:
+    """Index type and its tunable parameters"""
+    index_type: str = 'flat'
+    # HNSW
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64
+    # IVF-PQ
+    ivf_nlist: int = 1024
+    ivf_nprobe: int = 16
+    pq_m: int = 64
+    pq_nbits: int = 8
+    # Carga memory-mapped del índice (solo lectura). FAISS solo mapea las listas invertidas
+    # de los índices IVF: flat y HNSW se leen siempre completos en RAM, así que solo aplica a ivfpq
+    mmap: bool = False
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice no soportado: {self.index_type}")
+        if self.mmap and not self.uses_mmap:
+            print(f"mmap no tiene efecto con índices {self.index_type} (solo ivfpq); se cargará completo")
+
+    @property
+    def uses_mmap(self) -> bool:
+        """mmap is only honoured by FAISS for IVF inverted lists"""
+        return self.mmap and self.index_type == 'ivfpq'
+
+    def build_params(self) -> Dict:
+        """Parameters that change the index contents (a change requires a rebuild)"""
+        params = {'index_type': self.index_type}
+        if self.index_type == 'hnsw':
+            params.update(hnsw_m=self.hnsw_m, hnsw_ef_construction=self.hnsw_ef_construction)
+        elif self.index_type == 'ivfpq':
+            params.update(ivf_nlist=self.ivf_nlist, pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        return params
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def build_index(dim: int, config: IndexConfig, training_vectors: Optional[np.ndarray] = None) -> faiss.Index:
+    """Create an empty (trained, if needed) FAISS index for the configuration"""
+    if config.index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        index.hnsw.efConstruction = config.hnsw_ef_construction
+    elif config.index_type == 'ivfpq':
+        n = 0 if training_vectors is None else len(training_vectors)
+        if not can_train(config, dim, n):
+            # Sin datos suficientes para entrenar, IVF-PQ no tiene sentido todavía
+            print(f"IVF-PQ requiere más vectores de entrenamiento ({n}); usando índice flat "
+                  f"hasta la próxima ingesta con suficientes datos")
+            return faiss.IndexFlatL2(dim)
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, config.ivf_nlist, config.pq_m, config.pq_nbits)
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+    else:
+        index = faiss.IndexFlatL2(dim)
+    apply_search_params(index, config)
+    return index
+
+
+def can_train(config: IndexConfig, dim: int, n: int) -> bool:
+    """Whether n vectors of dimension dim are enough to train the configured index"""
+    if config.index_type != 'ivfpq':
+        return True
+    return dim % config.pq_m == 0 and n >= max(config.ivf_nlist, 2 ** config.pq_nbits)
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Index type actually built (IVF-PQ falls back to flat until it can be trained)"""
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivfpq'
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    return 'flat'
+
+
+def apply_search_params(index: faiss.Index, config: IndexConfig) -> None:
+    """Set query-time parameters (efSearch / nprobe)"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.hnsw_ef_search
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.ivf_nprobe
+
+
+def create_vector_store(embeddings, config: IndexConfig, texts: Sequence[str],
+                        vectors: np.ndarray, metadatas: Sequence[Dict], ids: Sequence[str]) -> FAISS:
+    """Create a vector store of the configured index type from precomputed vectors"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = build_index(vectors.shape[1], config, training_vectors=vectors)
+    vector_store = FAISS(embeddings, index, InMemoryDocstore(), {})
+    add_vectors(vector_store, texts, vectors, metadatas, ids)
+    return vector_store
+
+
+def add_vectors(vector_store: FAISS, texts: Sequence[str], vectors: np.ndarray,
+                metadatas: Sequence[Dict], ids: Sequence[str]) -> None:
+    vector_store.add_embeddings(list(zip(texts, np.asarray(vectors, dtype=np.float32).tolist())),
+                                metadatas=list(metadatas), ids=list(ids))
+
+
+def search_many(vector_store: FAISS, query_vectors: np.ndarray, k: int = 4) -> List[List]:
+    """Search several query vectors with a single FAISS call; returns the documents per query"""
+    vectors = np.array(query_vectors, dtype=np.float32, ndmin=2)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    _, positions = vector_store.index.search(vectors, k)
+    results = []
+    for row in positions:
+        docs = []
+        for position in row:
+            if position == -1:
+                continue
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+            if not isinstance(doc, str):
+                docs.append(doc)
+        results.append(docs)
+    return results
+
+
+def extract_vectors(vector_store: FAISS):
+    """Return (texts, vectors, metadatas, ids) stored in a vector store, in index order"""
+    index = vector_store.index
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), 'float32')
+    texts, metadatas, ids = [], [], []
+    for position in range(index.ntotal):
+        doc_id = vector_store.index_to_docstore_id[position]
+        doc = vector_store.docstore.search(doc_id)
+        texts.append(doc.page_content)
+        metadatas.append(doc.metadata)
+        ids.append(doc_id)
+    return texts, vectors, metadatas, ids
+
+
+def delete_ids(vector_store: FAISS, ids: List[str], config: IndexConfig) -> FAISS:
+    """Delete ids, rebuilding the index unless it is flat
+
+    langchain renumbers index_to_docstore_id to 0..n-1 after a removal, which
+    only matches flat indexes: HNSW cannot remove vectors and IVF keeps the
+    old labels of the remaining ones. IVF rebuilds reuse the trained quantizers.
+    """
+    if isinstance(vector_store.index, faiss.IndexFlat):
+        vector_store.delete(ids)
+        return vector_store
+    print("El índice no admite borrado en orden, reconstruyendo sin los fragmentos eliminados...")
+    removed = set(ids)
+    texts, vectors, metadatas, doc_ids = extract_vectors(vector_store)
+    keep = [i for i, doc_id in enumerate(doc_ids) if doc_id not in removed]
+    if isinstance(vector_store.index, faiss.IndexIVF):
+        index = faiss.clone_index(vector_store.index)
+        index.reset()
+        apply_search_params(index, config)
+    else:
+        index = build_index(vectors.shape[1], config, training_vectors=vectors[keep])
+    rebuilt = FAISS(vector_store.embedding_function, index, InMemoryDocstore(), {})
+    if keep:
+        add_vectors(rebuilt, [texts[i] for i in keep], vectors[keep],
+                    [metadatas[i] for i in keep], [doc_ids[i] for i in keep])
+    return rebuilt
+
+
+def upgrade_index(vector_store: FAISS, config: IndexConfig) -> FAISS:
+    """Rebuild a fallback flat index as the configured type once it has enough vectors to train"""
+    index = vector_store.index
+    built = index_type_of(index)
+    if built == config.index_type or not can_train(config, index.d, index.ntotal):
+        return vector_store
+    print(f"El índice {built} ya tiene {index.ntotal} vectores, reconstruyéndolo como {config.index_type}...")
+    texts, vectors, metadatas, ids = extract_vectors(vector_store)
+    return create_vector_store(vector_store.embedding_function, config, texts, vectors, metadatas, ids)
+
+
+def save_vector_store(vector_store: FAISS, folder_path: str) -> None:
+    """Write the FAISS index and commit its chunks to the SQLite docstore in folder_path"""
+    os.makedirs(folder_path, exist_ok=True)
+    db_path = os.path.join(folder_path, CHUNKS_DB)
+    docstore = vector_store.docstore
+    mapping = vector_store.index_to_docstore_id
+
+    if isinstance(docstore, SQLiteDocstore) and os.path.abspath(docstore.path) == os.path.abspath(db_path):
+        docstore.save_mapping(mapping)
+        docstore.commit()
+    else:
+        # Docstore en memoria u otra base de datos: se vuelca a una base nueva
+        tmp_path = db_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        target = SQLiteDocstore(tmp_path)
+        target.copy_from(docstore, mapping.values())
+        target.save_mapping(mapping)
+        target.commit()
+        target.close()
+        os.replace(tmp_path, db_path)
+
+    index_path = os.path.join(folder_path, "index.faiss")
+    faiss.write_index(vector_store.index, index_path + '.tmp')
+    os.replace(index_path + '.tmp', index_path)
+
+    legacy_path = os.path.join(folder_path, "index.pkl")
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def load_vector_store(folder_path: str, embeddings, config: IndexConfig,
+                      read_only: bool = False, migrate_legacy: bool = False, **kwargs) -> FAISS:
+    """Load a saved vector store, memory-mapping IVF-PQ inverted lists when configured and read_only
+
+    Chunk texts are resolved lazily from SQLite, so nothing is unpickled. A
+    store still holding the old index.pkl docstore is only converted when
+    migrate_legacy is set; otherwise FileNotFoundError is raised.
+    """
+    db_path = os.path.join(folder_path, CHUNKS_DB)
+    if not os.path.exists(db_path) and not migrate_legacy:
+        raise FileNotFoundError(f"{folder_path} no tiene {CHUNKS_DB} (docstore pickle sin migrar)")
+
+    index_path = os.path.join(folder_path, "index.faiss")
+    index = None
+    if config.uses_mmap and read_only:
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"No se pudo mapear el índice en memoria ({str(e)}), cargándolo completo")
+    if index is None:
+        index = faiss.read_index(index_path)
+    apply_search_params(index, config)
+
+    if not os.path.exists(db_path):
+        return _migrate_legacy_store(folder_path, embeddings, index, **kwargs)
+    docstore = SQLiteDocstore(db_path)
+    return FAISS(embeddings, index, docstore, docstore.index_mapping(), **kwargs)
+
+
+def _migrate_legacy_store(folder_path: str, embeddings, index: faiss.Index, **kwargs) -> FAISS:
+    """Convert a langchain index.pkl docstore to SQLite (the only unpickling, done once)"""
+    legacy_path = os.path.join(folder_path, "index.pkl")
+    print(f"Migrando docstore pickle de {folder_path} a SQLite...")
+    with open(legacy_path, 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    save_vector_store(FAISS(embeddings, index, docstore, index_to_docstore_id), folder_path)
+    sqlite_docstore = SQLiteDocstore(os.path.join(folder_path, CHUNKS_DB))
+    return FAISS(embeddings, index, sqlite_docstore, sqlite_docstore.index_mapping(), **kwargs)
+
+
+def recall_report(reference: FAISS, query_vectors: np.ndarray, configs: Sequence[IndexConfig],
+                  k: int = 10) -> List[Dict]:
+    """Compare recall@k and query latency of each config against an exact flat index"""
+    _, vectors, _, _ = extract_vectors(reference)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(query_vectors, dtype=np.float32)
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    baseline = _timed_search(flat, queries, k)
+    truth = baseline['labels']
+
+    report = [_report_row('flat', baseline, truth, k, flat)]
+    for config in configs:
+        start = time.perf_counter()
+        index = build_index(vectors.shape[1], config, training_vectors=vectors)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        row = _report_row(config.index_type, _timed_search(index, queries, k), truth, k, index)
+        row['build_seconds'] = round(build_seconds, 3)
+        row['config'] = config.to_dict()
+        report.append(row)
+    return report
+
+
+def _timed_search(index: faiss.Index, queries: np.ndarray, k: int) -> Dict:
+    start = time.perf_counter()
+    _, labels = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return {'labels': labels, 'ms_per_query': elapsed * 1000 / max(1, len(queries))}
+
+
+def _report_row(name: str, result: Dict, truth: np.ndarray, k: int, index: faiss.Index) -> Dict:
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(result['labels'], truth))
+    return {
+        'index_type': name,
+        'recall_at_k': round(hits / max(1, truth.size), 4),
+        'k': k,
+        'ms_per_query': round(result['ms_per_query'], 4),
+        'index_bytes': len(faiss.serialize_index(index)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latencia de índices FAISS frente a flat")
+    parser.add_argument('--vector-store', default="rag/vector_store")
+    parser.add_argument('--embeddings-model', default="intfloat/multilingual-e5-large")
+    parser.add_argument('--queries', nargs='+', required=True)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--hnsw-ef-search', type=int, default=64)
+    parser.add_argument('--ivf-nlist', type=int, default=1024)
+    parser.add_argument('--ivf-nprobe', type=int, default=16)
+    parser.add_argument('--pq-m', type=int, default=64)
+    args = parser.parse_args()
+
+    from rag.embeddings import EmbeddingConfig, create_embeddings, embed_queries
+    embeddings = create_embeddings(EmbeddingConfig(model_name=args.embeddings_model))
+    reference = load_vector_store(args.vector_store, embeddings, IndexConfig(), migrate_legacy=True)
+    configs = [
+        IndexConfig('hnsw', hnsw_m=args.hnsw_m, hnsw_ef_search=args.hnsw_ef_search),
+        IndexConfig('ivfpq', ivf_nlist=args.ivf_nlist, ivf_nprobe=args.ivf_nprobe, pq_m=args.pq_m),
+    ]
+    query_vectors = np.array(embed_queries(embeddings, args.queries), dtype=np.float32)
+    print(json.dumps(recall_report(reference, query_vectors, configs, k=args.k), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+# Planificador de inferencia: varias instancias del modelo, prioridades y contrapresión
+
+import itertools
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from monitoring.metrics import LLM_TOKENS, LLM_TOKENS_PER_SECOND, observe_stage
+
+# Menor valor = mayor prioridad
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_END = object()
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when the scheduler queue is at its maximum depth"""
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when a request does not finish before its deadline"""
+
+
+class InferenceRequest:
+    """A queued generation; tokens are delivered through a thread-safe queue"""
+
+    def __init__(self, prompt: str, priority: int, timeout: Optional[float], params: Dict,
+                 timeout_from_start: bool = False):
+        self.prompt = prompt
+        self.priority = priority
+        self.params = params
+        self.timeout = timeout
+        self.timeout_from_start = timeout_from_start
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        # Con timeout_from_start el plazo no corre mientras la petición espera en cola
+        self.deadline = self.enqueued_at + timeout if timeout and not timeout_from_start else None
+        self.error: Optional[BaseException] = None
+        self._tokens: 'queue.Queue' = queue.Queue()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Ask the worker to stop decoding (or to skip the request if not started)"""
+        self._cancelled.set()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def _start(self) -> None:
+        self.started_at = time.monotonic()
+        if self.timeout and self.timeout_from_start:
+            self.deadline = self.started_at + self.timeout
+
+    def iter_tokens(self) -> Iterator[str]:
+        """Yield tokens as they are produced; raises the worker error or a timeout"""
+        while True:
+            remaining = None
+            if self.deadline is not None:
+                remaining = max(0.0, self.deadline - time.monotonic())
+            try:
+                token = self._tokens.get(timeout=remaining)
+            except queue.Empty:
+                self.cancel()
+                raise InferenceTimeoutError("Tiempo de inferencia agotado")
+            if token is _END:
+                if self.error:
+                    raise self.error
+                return
+            yield token
+
+    def result(self) -> str:
+        return "".join(self.iter_tokens())
+
+    def _put(self, token: str) -> None:
+        self._tokens.put(token)
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        self._tokens.put(_END)
+
+
+class InferenceScheduler:
+    """Owns N model instances and serves queued requests by priority
+
+    model_factory must return a callable with the ctransformers signature
+    model(prompt, stream=True, **params) -> iterator of tokens.
+    """
+
+    def __init__(self, model_factory: Callable[[], Any], instances: int = 1,
+                 max_queue_depth: int = 32, default_timeout: Optional[float] = 300):
+        self.model_factory = model_factory
+        self.instances = instances
+        self.max_queue_depth = max_queue_depth
+        self.default_timeout = default_timeout
+        self._queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._loaded = 0
+        self._busy = 0
+        self._load_errors: List[str] = []
+        self._tokenizer: Optional[Callable[[str], List[int]]] = None
+        self._all_loaded = threading.Event()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._workers = [
+            threading.Thread(target=self._worker, args=(i,), name=f'inference-{i}', daemon=True)
+            for i in range(instances)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, prompt: str, priority: int = PRIORITY_BATCH,
+               timeout: Optional[float] = None, timeout_from_start: bool = False,
+               **params) -> InferenceRequest:
+        """Queue a request; raises InferenceQueueFullError when saturated
+
+        The timeout counts from enqueue time, or from the start of decoding
+        when timeout_from_start is set.
+        """
+        with self._lock:
+            if self._queue.qsize() >= self.max_queue_depth:
+                self.rejected += 1
+                raise InferenceQueueFullError("Cola de inferencia llena, inténtalo más tarde")
+            request = InferenceRequest(prompt, priority,
+                                       timeout if timeout is not None else self.default_timeout,
+                                       params, timeout_from_start=timeout_from_start)
+            self._queue.put((priority, next(self._sequence), request))
+        return request
+
+    def generate(self, prompt: str, priority: int = PRIORITY_BATCH,
+                 timeout: Optional[float] = None, **params) -> str:
+        """Queue a request and block until the full completion is available"""
+        return self.submit(prompt, priority, timeout, **params).result()
+
+    def stream(self, prompt: str, priority: int = PRIORITY_BATCH,
+               timeout: Optional[float] = None, **params) -> Iterator[str]:
+        """Queue a request and yield its tokens; closing the iterator stops decoding"""
+        request = self.submit(prompt, priority, timeout, **params)
+        try:
+            yield from request.iter_tokens()
+        finally:
+            request.cancel()
+
+    def is_saturated(self) -> bool:
+        return self._queue.qsize() >= self.max_queue_depth
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Block until every instance has been created (or failed to load)"""
+        return self._all_loaded.wait(timeout)
+
+    @property
+    def loaded_instances(self) -> int:
+        return self._loaded
+
+    @property
+    def tokenizer(self) -> Optional[Callable[[str], List[int]]]:
+        """Tokenizer of the first loaded model instance, or None while none is loaded"""
+        return self._tokenizer
+
+    def stats(self) -> Dict:
+        """Return queue depth, utilisation and wait time counters"""
+        with self._lock:
+            started = self.completed + self._busy
+            return {
+                'instances': self.instances,
+                'loaded_instances': self._loaded,
+                'busy_instances': self._busy,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self._wait_total / started * 1000, 1) if started else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 1),
+                'load_errors': list(self._load_errors),
+            }
+
+    def _worker(self, number: int) -> None:
+        try:
+            model = self.model_factory()
+        except Exception as e:
+            print(f"Error cargando instancia de inferencia {number}: {str(e)}")
+            traceback.print_exc()
+            with self._lock:
+                self._load_errors.append(str(e))
+                self._check_all_loaded()
+                all_failed = len(self._load_errors) == self.instances
+            if all_failed:
+                # Sin ninguna instancia válida se responde con el error para no colgar a nadie
+                self._fail_forever(e)
+            return
+        with self._lock:
+            self._loaded += 1
+            if self._tokenizer is None and hasattr(model, 'tokenize'):
+                # El vocabulario es de solo lectura: se puede tokenizar fuera del worker
+                self._tokenizer = model.tokenize
+            self._check_all_loaded()
+
+        while True:
+            _, _, request = self._queue.get()
+            if request.cancelled:
+                request._finish()
+                continue
+            if request.expired():
+                with self._lock:
+                    self.timeouts += 1
+                request._finish(InferenceTimeoutError("Tiempo de espera en cola agotado"))
+                continue
+
+            request._start()
+            wait = request.started_at - request.enqueued_at
+            with self._lock:
+                self._busy += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            completion_tokens = 0
+            try:
+                error = None
+                if self._tokenizer is not None:
+                    LLM_TOKENS.inc(len(self._tokenizer(request.prompt)), kind='prompt')
+                for token in model(request.prompt, stream=True, **request.params):
+                    if request.expired():
+                        with self._lock:
+                            self.timeouts += 1
+                        error = InferenceTimeoutError("Tiempo de inferencia agotado")
+                        break
+                    if request.cancelled:
+                        break
+                    completion_tokens += 1
+                    request._put(token)
+                request._finish(error)
+            except Exception as e:
+                print(f"Error en inferencia: {str(e)}")
+                traceback.print_exc()
+                request._finish(e)
+            finally:
+                decode_seconds = time.monotonic() - request.started_at
+                observe_stage('llm_decode', decode_seconds)
+                LLM_TOKENS.inc(completion_tokens, kind='completion')
+                if completion_tokens and decode_seconds > 0:
+                    LLM_TOKENS_PER_SECOND.observe(completion_tokens / decode_seconds)
+                with self._lock:
+                    self._busy -= 1
+                    self.completed += 1
+
+    def _check_all_loaded(self) -> None:
+        if self._loaded + len(self._load_errors) == self.instances:
+            self._all_loaded.set()
+
+    def _fail_forever(self, error: Exception) -> None:
+        """Keep draining the queue with the load error so callers do not hang"""
+        while True:
+            _, _, request = self._queue.get()
+            request._finish(error)
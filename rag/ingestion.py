@@ -0,0 +1,410 @@
+# Ingesta incremental de la base de conocimiento en el vector store
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+
+from rag.embeddings import DEFAULT_EMBEDDINGS_MODEL, EMBEDDING_BACKENDS, EmbeddingConfig, create_embeddings
+from rag.index_factory import (INDEX_TYPES, IndexConfig, add_vectors, create_vector_store, delete_ids,
+                               extract_vectors, index_type_of, load_vector_store, save_vector_store,
+                               upgrade_index)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 4
+SUPPORTED_EXTENSIONS = ('.txt', '.md')
+
+# Modelo de embeddings de cada proceso del pool (ver _init_embedding_worker)
+_worker_embeddings = None
+
+
+@dataclass
+class IngestionStats:
+    """Summary of one ingestion run"""
+    files: int = 0
+    changed_files: int = 0
+    chunks_added: int = 0
+    chunks_removed: int = 0
+    shards: int = 0
+    # Tipo de índice construido (ivfpq usa flat mientras no hay datos para entrenarlo)
+    index_type: str = ''
+    seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    peak_rss_mb: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class KnowledgeBaseIngestor:
+    """Keep a FAISS vector store in sync with every file in data_dir
+
+    A manifest stores the build settings, the content hash of each file and
+    the ids of its chunks. Chunks are diffed against the ids in the index
+    itself, so only missing chunks are embedded and chunks no file produces
+    any more are removed. Documents are streamed through the text splitter,
+    embedded in batches (optionally across a process pool) and written to
+    on-disk flat shards whose vectors are added to the configured index type
+    at the end.
+    """
+
+    def __init__(self, embeddings, data_dir: str, vector_store_path: str,
+                 embedding_config: EmbeddingConfig, default_texts: Optional[List[str]] = None,
+                 chunk_size: int = 1000, chunk_overlap: int = 100,
+                 batch_size: int = 64, workers: int = 0,
+                 threads_per_worker: int = 1, shard_size: int = 10000,
+                 index_config: Optional[IndexConfig] = None):
+        self.embeddings = embeddings
+        self.data_dir = data_dir
+        self.vector_store_path = vector_store_path
+        self.embedding_config = embedding_config
+        self.default_texts = default_texts or []
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.shard_size = shard_size
+        self.index_config = index_config or IndexConfig()
+        self.manifest_path = os.path.join(vector_store_path, MANIFEST_NAME)
+        self.shards_path = os.path.join(vector_store_path, "shards")
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+        self.last_stats: Optional[IngestionStats] = None
+
+    def sync(self, vector_store: Optional[FAISS]) -> FAISS:
+        """Apply the changes in data_dir to vector_store (created if None) and save it"""
+        start = time.perf_counter()
+        stats = IngestionStats()
+        manifest = self._load_manifest()
+        if vector_store is not None and not self._manifest_matches(manifest):
+            # Índice sin manifest o con otro modelo/troceado: se reconstruye
+            print("Vector store sin manifest compatible, reconstruyendo...")
+            vector_store = None
+        if vector_store is None:
+            manifest = self._empty_manifest()
+
+        old_files: Dict[str, Dict] = manifest['files']
+        new_files: Dict[str, Dict] = {}
+        # Los ids del propio índice mandan: si el proceso murió entre guardar el índice y el
+        # manifest, los fragmentos ya indexados no se vuelven a añadir y los huérfanos se borran
+        present = set(vector_store.index_to_docstore_id.values()) if vector_store is not None else set()
+
+        # Las altas se embeben en streaming; new_files se completa al consumirlas
+        additions = self._plan_additions(old_files, new_files, present, stats)
+        shard_paths = self._embed_to_shards(additions, stats)
+
+        stats.changed_files += sum(1 for source in old_files if source not in new_files)
+        wanted = {chunk_id for entry in new_files.values() for chunk_id in entry['chunks']}
+        stale = [chunk_id for chunk_id in present if chunk_id not in wanted]
+
+        if vector_store is not None and not shard_paths and not stale:
+            # Un índice flat provisional se vuelve a comprobar aunque no haya cambios
+            upgraded = upgrade_index(vector_store, self.index_config)
+            if upgraded is vector_store:
+                if new_files != old_files:
+                    self._save_manifest(dict(manifest, files=new_files))
+                print("Vector store al día, sin cambios en la base de conocimiento")
+                stats.index_type = index_type_of(vector_store.index)
+                self._finish_stats(stats, start)
+                return vector_store
+            vector_store = upgraded
+
+        if stale:
+            vector_store = delete_ids(vector_store, stale, self.index_config)
+            stats.chunks_removed = len(stale)
+
+        vector_store = self._merge_shards(vector_store, shard_paths)
+        vector_store = upgrade_index(vector_store, self.index_config)
+        stats.index_type = index_type_of(vector_store.index)
+
+        manifest['files'] = new_files
+        manifest['built_index'] = stats.index_type
+        save_vector_store(vector_store, self.vector_store_path)
+        self._save_manifest(manifest)
+
+        self._finish_stats(stats, start)
+        print(f"Ingesta incremental: {stats.chunks_added} fragmentos nuevos, "
+              f"{stats.chunks_removed} eliminados, {stats.chunks_per_second:.1f} fragmentos/s, "
+              f"pico RSS {stats.peak_rss_mb:.0f} MB")
+        return vector_store
+
+    def _plan_additions(self, old_files: Dict[str, Dict], new_files: Dict[str, Dict],
+                        present: Set[str], stats: IngestionStats) -> Iterator[Tuple[str, str, str]]:
+        """Yield (id, text, source) for every chunk that is not yet in the index"""
+        for source, file_hash, text in self._scan_sources(old_files):
+            stats.files += 1
+            previous = old_files.get(source)
+            if previous and previous['hash'] == file_hash:
+                new_files[source] = previous
+                continue
+
+            stats.changed_files += 1
+            chunk_ids = []
+            seen = set()
+            for chunk in self.text_splitter.split_text(text):
+                chunk_id = self._chunk_id(source, chunk)
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                chunk_ids.append(chunk_id)
+                if chunk_id not in present:
+                    yield chunk_id, chunk, source
+            new_files[source] = {'hash': file_hash, 'chunks': chunk_ids}
+
+    def _embed_to_shards(self, additions: Iterator[Tuple[str, str, str]],
+                         stats: IngestionStats) -> List[str]:
+        """Embed additions in batches and write them to shard indexes on disk"""
+        shutil.rmtree(self.shards_path, ignore_errors=True)
+        shard_paths: List[str] = []
+        shard: List[Tuple[Tuple[str, str, str], List[float]]] = []
+
+        def collect(batch, vectors):
+            shard.extend(zip(batch, vectors))
+            stats.chunks_added += len(batch)
+            if len(shard) >= self.shard_size:
+                shard_paths.append(self._write_shard(shard, len(shard_paths)))
+                shard.clear()
+
+        executor = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_embedding_worker,
+                initargs=(self.embedding_config, self.threads_per_worker)
+            )
+        try:
+            in_flight = deque()
+            for batch in _batched(additions, self.batch_size):
+                texts = [item[1] for item in batch]
+                if executor is None:
+                    collect(batch, self.embeddings.embed_documents(texts))
+                    continue
+                in_flight.append((batch, executor.submit(_embed_batch, texts)))
+                # Se limita el trabajo en vuelo para mantener la memoria acotada
+                while len(in_flight) >= self.workers * 2:
+                    done_batch, future = in_flight.popleft()
+                    collect(done_batch, future.result())
+            while in_flight:
+                done_batch, future = in_flight.popleft()
+                collect(done_batch, future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if shard:
+            shard_paths.append(self._write_shard(shard, len(shard_paths)))
+        stats.shards = len(shard_paths)
+        return shard_paths
+
+    def _write_shard(self, shard: List[Tuple[Tuple[str, str, str], List[float]]], number: int) -> str:
+        path = os.path.join(self.shards_path, f"shard_{number:05d}")
+        store = FAISS.from_embeddings(
+            [(item[1], vector) for item, vector in shard],
+            self.embeddings,
+            metadatas=[{'source': item[2]} for item, _ in shard],
+            ids=[item[0] for item, _ in shard]
+        )
+        save_vector_store(store, path)
+        return path
+
+    def _merge_shards(self, vector_store: Optional[FAISS], shard_paths: List[str]) -> FAISS:
+        for path in shard_paths:
+            shard = load_vector_store(path, self.embeddings, IndexConfig())
+            texts, vectors, metadatas, ids = extract_vectors(shard)
+            if vector_store is None:
+                # El primer shard sirve también para entrenar IVF-PQ
+                vector_store = create_vector_store(self.embeddings, self.index_config,
+                                                   texts, vectors, metadatas, ids)
+            else:
+                add_vectors(vector_store, texts, vectors, metadatas, ids)
+        shutil.rmtree(self.shards_path, ignore_errors=True)
+        if vector_store is None:
+            raise ValueError(f"No hay contenido para indexar en {self.data_dir}")
+        return vector_store
+
+    def needs_rebuild(self) -> bool:
+        """Return True when the saved index was built with other settings (sync starts from scratch)"""
+        return not self._manifest_matches(self._load_manifest())
+
+    def needs_update(self) -> bool:
+        """Return True when data_dir differs from the manifest (or the manifest is stale)"""
+        manifest = self._load_manifest()
+        if not self._manifest_matches(manifest):
+            return True
+        old_files = manifest['files']
+        seen = set()
+        for source, file_hash, _ in self._scan_sources(old_files):
+            seen.add(source)
+            previous = old_files.get(source)
+            if not previous or previous['hash'] != file_hash:
+                return True
+        return seen != set(old_files)
+
+    def _scan_sources(self, old_files: Dict[str, Dict]) -> Iterator[Tuple[str, str, str]]:
+        """Yield (source, content hash, text) for every file; text is only decoded when changed"""
+        found = False
+        for root, dirnames, filenames in os.walk(self.data_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                source = os.path.relpath(path, self.data_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                found = True
+                file_hash = hashlib.sha256(raw).hexdigest()
+                previous = old_files.get(source)
+                if previous and previous['hash'] == file_hash:
+                    yield source, file_hash, ''
+                else:
+                    yield source, file_hash, _decode(raw, source)
+
+        if not found and self.default_texts:
+            # Sin ficheros en data_dir se indexa el contenido por defecto
+            raw = "\n\n".join(self.default_texts)
+            yield '__default__', hashlib.sha256(raw.encode('utf-8')).hexdigest(), raw
+
+    def _finish_stats(self, stats: IngestionStats, start: float) -> None:
+        stats.seconds = round(time.perf_counter() - start, 3)
+        if stats.seconds > 0:
+            stats.chunks_per_second = round(stats.chunks_added / stats.seconds, 1)
+        stats.peak_rss_mb = round(_peak_rss_mb(), 1)
+        self.last_stats = stats
+
+    @staticmethod
+    def _chunk_id(source: str, chunk: str) -> str:
+        return hashlib.sha256(f"{source}\0{chunk}".encode('utf-8')).hexdigest()[:32]
+
+    def _empty_manifest(self) -> Dict:
+        return {
+            'version': MANIFEST_VERSION,
+            'embeddings': self.embedding_config.build_params(),
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'index': self.index_config.build_params(),
+            'files': {}
+        }
+
+    def _manifest_matches(self, manifest: Dict) -> bool:
+        expected = self._empty_manifest()
+        return all(manifest.get(key) == expected[key] for key in expected if key != 'files')
+
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def _decode(raw: bytes, source: str) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Un fichero mal codificado no debe abortar toda la ingesta
+        print(f"{source} no es UTF-8 válido ({str(e)}), se sustituyen los bytes inválidos")
+        return raw.decode('utf-8', errors='replace')
+
+
+def _batched(items: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _init_embedding_worker(embedding_config: EmbeddingConfig, threads: int) -> None:
+    """Load the embeddings model once per pool process"""
+    global _worker_embeddings
+    _worker_embeddings = create_embeddings(replace(embedding_config, threads=threads))
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process plus its finished children, in MB"""
+    if resource is None:
+        return 0.0
+    peak_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+               + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak_kb / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta de la base de conocimiento en FAISS")
+    parser.add_argument('--data-dir', default="rag/data")
+    parser.add_argument('--vector-store', default="rag/vector_store")
+    parser.add_argument('--embeddings-model', default=DEFAULT_EMBEDDINGS_MODEL)
+    parser.add_argument('--embeddings-backend', choices=EMBEDDING_BACKENDS, default='torch')
+    parser.add_argument('--quantize', action='store_true', help="Embeddings con pesos int8")
+    parser.add_argument('--embeddings-batch-size', type=int, default=32)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    args = parser.parse_args()
+
+    embedding_config = EmbeddingConfig(
+        model_name=args.embeddings_model,
+        backend=args.embeddings_backend,
+        quantize=args.quantize,
+        batch_size=args.embeddings_batch_size
+    )
+    embeddings = create_embeddings(embedding_config)
+    ingestor = KnowledgeBaseIngestor(
+        embeddings,
+        data_dir=args.data_dir,
+        vector_store_path=args.vector_store,
+        embedding_config=embedding_config,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        shard_size=args.shard_size,
+        index_config=IndexConfig(index_type=args.index_type)
+    )
+
+    vector_store = None
+    # Si la configuración cambió, sync reconstruye desde cero: no se carga ni se migra nada
+    if os.path.exists(os.path.join(args.vector_store, "index.faiss")) and not ingestor.needs_rebuild():
+        vector_store = load_vector_store(args.vector_store, embeddings, ingestor.index_config,
+                                         migrate_legacy=True)
+    ingestor.sync(vector_store)
+    print(json.dumps(ingestor.last_stats.to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,73 +1,268 @@
-from typing import List, Dict, Optional
-import json
+from collections import deque
+from typing import Callable, Iterator, List, Dict, Optional
+import logging
 import os
+import threading
+import time
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import CTransformers
+from langchain_core.embeddings import Embeddings
 import traceback
-from content_generator import ContentGenerator
+from monitoring.metrics import span
+from rag.context_packer import ContextPacker
+from rag.embeddings import EmbeddingConfig, create_embeddings, embed_queries
+from rag.generation_cache import GenerationCache
+from rag.ingestion import KnowledgeBaseIngestor
+from rag.index_factory import IndexConfig, load_vector_store, search_many
+from rag.inference_pool import (InferenceScheduler, InferenceQueueFullError,
+                                PRIORITY_BATCH, PRIORITY_INTERACTIVE)
+
+logger = logging.getLogger(__name__)
+
+# Límites de tokens del modo esquema + expansión por sección
+OUTLINE_MAX_NEW_TOKENS = 128
+SECTION_MAX_NEW_TOKENS = 256
+
+# Presupuesto del prompt de secciones: tokens por sección y secciones por llamada
+DEFAULT_SECTIONS = 4
+TOKENS_PER_SECTION = 96
+MAX_SECTIONS_PER_CALL = 4
+# Puntos que el prompt pide por sección (el parser cierra la última sección al tenerlos)
+POINTS_PER_SECTION = 3
+
+# Segundos de espera antes de reintentar un warm-up fallido
+WARMUP_RETRY_SECONDS = 60
 
 class RAGHandler:
     def __init__(self, 
                  model_path: str = "models/llama-2-7b-chat.gguf",
                  embeddings_model: str = "intfloat/multilingual-e5-large",
                  data_dir: str = "rag/data",
-                 vector_store_path: str = "rag/vector_store"):
-        """Initialize RAG handler with models and data"""
+                 vector_store_path: str = "rag/vector_store",
+                 cache_dir: str = "rag/cache",
+                 lazy: bool = True,
+                 llm_instances: int = 1,
+                 llm_threads: int = 8,
+                 max_queue_depth: int = 32,
+                 request_timeout: float = 300,
+                 index_config: Optional[IndexConfig] = None,
+                 context_token_budget: int = 384,
+                 context_candidates: int = 8,
+                 llm_factory: Optional[Callable[[], object]] = None,
+                 embeddings_factory: Optional[Callable[[], object]] = None,
+                 embedding_config: Optional[EmbeddingConfig] = None):
+        """Initialize RAG handler; models and vector store load on first use unless lazy=False
+
+        llm_factory / embeddings_factory replace the default model loaders (e.g. with
+        deterministic fakes in benchmarks); llm_factory must return a model callable.
+        embedding_config selects the embeddings backend; without it embeddings_model
+        is used with the default settings.
+        """
+        print("\nInicializando RAG Handler...")
+        self.model_path = model_path
+        self.embedding_config = embedding_config or EmbeddingConfig(model_name=embeddings_model)
+        self.embeddings_model = self.embedding_config.model_name
+        self.data_dir = data_dir
+        self.vector_store_path = vector_store_path
+        self.index_config = index_config or IndexConfig()
+        self.llm_factory = llm_factory or (lambda: self._create_llm().client)
+        self.embeddings_factory = embeddings_factory or (lambda: create_embeddings(self.embedding_config))
+        self.llm_config = {
+            'max_new_tokens': 1024,    # Reducido para evitar exceder el contexto
+            'temperature': 0.7,
+            'context_length': 1024,    # Reducido para evitar exceder el contexto
+            'gpu_layers': 0,           # Use CPU
+            'threads': llm_threads,    # Hilos de CPU por instancia del modelo
+            'batch_size': 1,           # Keep batch size small
+            'top_k': 40,
+            'top_p': 0.95,
+            'stop': ['</s>']           # Stop token for Llama 2
+        }
+        
+        # Caché de generaciones (memoria + disco)
+        self.generation_cache = GenerationCache(cache_dir)
+        
+        # Contexto: se recuperan context_candidates fragmentos y se empaquetan en el presupuesto
+        self.context_candidates = context_candidates
+        self.context_packer = ContextPacker(token_budget=context_token_budget)
+        
+        # Planificador de inferencia (instancias del modelo, prioridades, cola acotada)
+        self.llm_instances = llm_instances
+        self.max_queue_depth = max_queue_depth
+        self.request_timeout = request_timeout
+        
+        # Componentes pesados: se cargan bajo demanda o en el warm-up
+        self._load_lock = threading.RLock()
+        self._scheduler = None
+        self._embeddings = None
+        self._ingestor = None
+        self._vector_store = None
+        self._generation_prompt = None
+        self._outline_prompt = None
+        self._section_prompt = None
+        self.warmup_error: Optional[str] = None
+        self._warmup_failed_at: Optional[float] = None
+        self._warmup_thread: Optional[threading.Thread] = None
+        
+        if not lazy:
+            self.load()
+    
+    def _create_llm(self) -> CTransformers:
+        """Load one instance of the LLM"""
+        print("Cargando modelo LLM...")
+        return CTransformers(
+            model=self.model_path,
+            model_type="llama",
+            config=self.llm_config
+        )
+    
+    @property
+    def scheduler(self) -> InferenceScheduler:
+        if self._scheduler is None:
+            with self._load_lock:
+                if self._scheduler is None:
+                    # Cada worker del planificador carga su propia instancia del modelo
+                    self._scheduler = InferenceScheduler(
+                        self.llm_factory,
+                        instances=self.llm_instances,
+                        max_queue_depth=self.max_queue_depth,
+                        default_timeout=self.request_timeout
+                    )
+        return self._scheduler
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._load_lock:
+                if self._embeddings is None:
+                    print("Cargando modelo de embeddings...")
+                    self._embeddings = self.embeddings_factory()
+        return self._embeddings
+    
+    @property
+    def ingestor(self) -> KnowledgeBaseIngestor:
+        if self._ingestor is None:
+            with self._load_lock:
+                if self._ingestor is None:
+                    self._ingestor = KnowledgeBaseIngestor(
+                        self.embeddings,
+                        data_dir=self.data_dir,
+                        vector_store_path=self.vector_store_path,
+                        embedding_config=self.embedding_config,
+                        default_texts=self._load_knowledge_base(None),
+                        index_config=self.index_config
+                    )
+        return self._ingestor
+    
+    @property
+    def vector_store(self) -> FAISS:
+        if self._vector_store is None:
+            with self._load_lock:
+                if self._vector_store is None:
+                    # Load or create vector store, embebiendo solo los cambios de data_dir
+                    self._vector_store = self._create_vector_store(self.data_dir)
+        return self._vector_store
+    
+    @property
+    def generation_prompt(self) -> PromptTemplate:
+        if self._generation_prompt is None:
+            self._generation_prompt = self._create_generation_prompt()
+        return self._generation_prompt
+    
+    @property
+    def outline_prompt(self) -> PromptTemplate:
+        if self._outline_prompt is None:
+            self._outline_prompt = self._create_outline_prompt()
+        return self._outline_prompt
+    
+    @property
+    def section_prompt(self) -> PromptTemplate:
+        if self._section_prompt is None:
+            self._section_prompt = self._create_section_prompt()
+        return self._section_prompt
+    
+    def load(self) -> None:
+        """Load every model and the vector store now"""
         try:
-            print("\nInicializando RAG Handler...")
-            
-            # Initialize LLM
-            print("Cargando modelo LLM...")
-            self.llm = CTransformers(
-                model=model_path,
-                model_type="llama",
-                config={
-                    'max_new_tokens': 1024,    # Reducido para evitar exceder el contexto
-                    'temperature': 0.7,
-                    'context_length': 1024,    # Reducido para evitar exceder el contexto
-                    'gpu_layers': 0,           # Use CPU
-                    'threads': 8,              # Use more CPU threads
-                    'batch_size': 1,           # Keep batch size small
-                    'top_k': 40,
-                    'top_p': 0.95,
-                    'stop': ['</s>']           # Stop token for Llama 2
-                }
-            )
-            
-            # Initialize embeddings
-            print("Cargando modelo de embeddings...")
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=embeddings_model
-            )
-            
-            # Load or create vector store
-            self.vector_store_path = vector_store_path
-            if os.path.exists(vector_store_path):
-                print("Cargando vector store existente...")
-                self.vector_store = FAISS.load_local(
-                    vector_store_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-            else:
-                print("Creando nuevo vector store...")
-                self.vector_store = self._create_vector_store(data_dir)
-            
-            # Create generation chain
-            print("Creando cadena de generación...")
-            self.generation_chain = self._create_generation_chain()
-            
+            self.scheduler.wait_loaded()
+            self.vector_store
             print("RAG Handler inicializado exitosamente!")
-            
         except Exception as e:
             print(f"Error inicializando RAG Handler: {str(e)}")
             traceback.print_exc()
             raise
     
+    def warm_up(self, query: str = "presentación") -> None:
+        """Load everything and run a warm-up query so the first request is fast"""
+        try:
+            self.load()
+            print("RAG - Ejecutando consulta de warm-up...")
+            self.retrieve_context(query)
+            # Un token basta para cargar los pesos en memoria y preparar el runtime
+            self.scheduler.generate(query, priority=PRIORITY_INTERACTIVE, max_new_tokens=1)
+            self.warmup_error = None
+            print("RAG - Warm-up completado, listo para recibir tráfico")
+        except Exception as e:
+            self.warmup_error = str(e)
+            self._warmup_failed_at = time.monotonic()
+            print(f"RAG - Error en warm-up: {str(e)}")
+    
+    def start_warm_up(self) -> threading.Thread:
+        """Run warm_up in a background daemon thread (once)"""
+        with self._load_lock:
+            if self._warmup_thread is None:
+                self._launch_warm_up()
+        return self._warmup_thread
+    
+    def retry_warm_up(self, retry_after: float = WARMUP_RETRY_SECONDS) -> bool:
+        """Start warm-up again if the last attempt failed more than retry_after seconds ago"""
+        with self._load_lock:
+            if (self._warmup_failed_at is None or self._warmup_thread.is_alive()
+                    or time.monotonic() - self._warmup_failed_at < retry_after):
+                return False
+            if self._scheduler is not None and self._scheduler.wait_loaded(0) \
+                    and not self._scheduler.loaded_instances:
+                # Ninguna instancia cargó: se descarta el planificador para volver a cargarlas
+                self._scheduler = None
+            self._launch_warm_up()
+            return True
+    
+    def _launch_warm_up(self) -> None:
+        self._warmup_failed_at = None
+        self._warmup_thread = threading.Thread(target=self.warm_up, name='rag-warmup', daemon=True)
+        self._warmup_thread.start()
+    
+    @property
+    def ready(self) -> bool:
+        """True once the vector store and at least one LLM instance are loaded (by warm-up or lazily)"""
+        return (self._vector_store is not None
+                and self._scheduler is not None
+                and self._scheduler.loaded_instances > 0)
+    
+    def status(self) -> Dict:
+        """Report which components are loaded"""
+        return {
+            'ready': self.ready,
+            'llm_loaded': bool(self._scheduler and self._scheduler.loaded_instances),
+            'embeddings_loaded': self._embeddings is not None,
+            'vector_store_loaded': self._vector_store is not None,
+            'warming_up': bool(self._warmup_thread and self._warmup_thread.is_alive()),
+            'error': self.warmup_error
+        }
+
+    def scheduler_stats(self) -> Dict:
+        """Inference scheduler stats without creating it (empty until the LLM is first needed)"""
+        scheduler = self._scheduler
+        return scheduler.stats() if scheduler is not None else {}
+
+    def embedding_stats(self) -> Dict:
+        """Embeddings backend settings plus throughput and query cache counters once loaded"""
+        stats = getattr(self._embeddings, 'stats', None)
+        if stats is not None:
+            return stats()
+        return dict(self.embedding_config.to_dict(), loaded=self._embeddings is not None)
+
     def _load_knowledge_base(self, path: Optional[str]) -> List[str]:
         """Load knowledge base from file or use default data"""
         if path and os.path.exists(path):
@@ -85,101 +280,315 @@ class RAGHandler:
         ]
     
     def _create_vector_store(self, data_dir: str) -> FAISS:
-        """Create new vector store"""
-        print("Creando nuevo vector store...")
-        texts = self._load_knowledge_base(os.path.join(data_dir, "knowledge_base.txt"))
-        vector_store = FAISS.from_texts(texts, self.embeddings)
-        
-        # Save vector store
-        os.makedirs(self.vector_store_path, exist_ok=True)
-        vector_store.save_local(self.vector_store_path)
+        """Load the saved vector store (if any) and sync it with every file in data_dir"""
+        exists = os.path.exists(os.path.join(self.vector_store_path, "index.faiss"))
+        if exists and self.ingestor.needs_rebuild():
+            # Se reconstruye desde cero: no tiene sentido cargarlo (ni migrar un docstore pickle)
+            print("Vector store creado con otra configuración, reconstruyendo...")
+            exists = False
+        # Con un manifest compatible, migrar el pickle antiguo sale más barato que re-embeber
+        if exists and not self.ingestor.needs_update():
+            print("Cargando vector store existente...")
+            return load_vector_store(self.vector_store_path, self.embeddings,
+                                     self.index_config, read_only=True, migrate_legacy=True)
         
+        vector_store = None
+        if exists:
+            print("Cargando vector store existente para actualizarlo...")
+            vector_store = load_vector_store(self.vector_store_path, self.embeddings,
+                                             self.index_config, migrate_legacy=True)
+        else:
+            print("Creando nuevo vector store...")
+        vector_store = self.ingestor.sync(vector_store)
+        if self.index_config.uses_mmap:
+            # Se sirve desde el índice mapeado en memoria recién guardado
+            vector_store = load_vector_store(self.vector_store_path, self.embeddings,
+                                             self.index_config, read_only=True)
         return vector_store
     
-    def _create_generation_chain(self) -> LLMChain:
-        """Create chain for generating presentation content"""
+    def refresh_knowledge_base(self) -> None:
+        """Re-ingest data_dir, embedding only new or changed chunks"""
+        with self._load_lock:
+            if self._vector_store is not None and not self.index_config.uses_mmap:
+                self._vector_store = self.ingestor.sync(self._vector_store)
+            else:
+                # Un índice mapeado es de solo lectura: se recarga desde disco
+                self._vector_store = self._create_vector_store(self.data_dir)
+    
+    def _create_generation_prompt(self) -> PromptTemplate:
+        """Create prompt for generating presentation content"""
         prompt = PromptTemplate(
-            input_variables=["context", "topic"],
-            template="""Genera 4 secciones para una presentación sobre {topic}. Usa este formato:
+            input_variables=["context", "topic", "sections", "instructions"],
+            partial_variables={"points": POINTS_PER_SECTION},
+            template="""Genera {sections} secciones para una presentación sobre {topic}.{instructions} Usa este formato:
 
 Sección 1 - [Título corto]
-Contenido detallado: [3 puntos cortos separados por puntos]
+Contenido detallado: [{points} puntos cortos separados por puntos]
 
 Sección 2 - [Título corto]
-Contenido detallado: [3 puntos cortos separados por puntos]
+Contenido detallado: [{points} puntos cortos separados por puntos]
 
 [etc...]
 
 Contexto útil: {context}
 """
         )
-        return LLMChain(llm=self.llm, prompt=prompt)
+        return prompt
+    
+    def _create_outline_prompt(self) -> PromptTemplate:
+        """Create prompt for the short outline (section titles only)"""
+        return PromptTemplate(
+            input_variables=["context", "topic", "sections", "instructions"],
+            template="""Escribe los títulos de {sections} secciones para una presentación sobre {topic}.{instructions}
+Responde solo con una lista numerada, un título corto por línea.
+
+Contexto útil: {context}
+"""
+        )
+    
+    def _create_section_prompt(self) -> PromptTemplate:
+        """Create prompt for expanding a single section"""
+        return PromptTemplate(
+            input_variables=["context", "topic", "section", "instructions"],
+            template="""Escribe el contenido de la sección "{section}" de una presentación sobre {topic}.{instructions}
+Responde con 3 puntos cortos, uno por línea, empezando cada uno con "- ".
+
+Contexto útil: {context}
+"""
+        )
+    
+    def retrieve_context(self, query: str) -> str:
+        """Return the packed context for a query"""
+        return self.pack_context(self.retrieve_documents(query))
+    
+    def retrieve_documents(self, query: str) -> List:
+        """Return the context_candidates closest chunks (with their metadata), best first"""
+        with span('embedding'):
+            vector = self.embeddings.embed_query(query)
+        with span('faiss_search'):
+            return self.vector_store.similarity_search_by_vector(vector, k=self.context_candidates)
+    
+    def retrieve_contexts(self, queries: List[str]) -> List[str]:
+        """Embed all queries in one batch and search them with a single FAISS call"""
+        if not queries:
+            return []
+        with span('embedding'):
+            vectors = embed_queries(self.embeddings, queries)
+        with span('faiss_search'):
+            results = search_many(self.vector_store, vectors, self.context_candidates)
+        return [self.pack_context(docs) for docs in results]
+    
+    def retrieve_merged_context(self, queries: List[str]) -> str:
+        """One packed context drawing on several queries (e.g. one per key point)"""
+        if len(queries) == 1:
+            return self.retrieve_context(queries[0])
+        with span('embedding'):
+            vectors = embed_queries(self.embeddings, queries)
+        with span('faiss_search'):
+            results = search_many(self.vector_store, vectors, self.context_candidates)
+        # Se intercalan los resultados por rango para que cada consulta aporte sus mejores fragmentos
+        merged, seen = [], set()
+        for rank in range(self.context_candidates):
+            for docs in results:
+                if rank < len(docs) and docs[rank].page_content not in seen:
+                    seen.add(docs[rank].page_content)
+                    merged.append(docs[rank])
+        return self.pack_context(merged)
+    
+    def pack_context(self, docs) -> str:
+        """Fit the retrieved chunks into the context token budget"""
+        tokenizer = self._scheduler.tokenizer if self._scheduler is not None else None
+        if tokenizer is not None and self.context_packer.tokenizer_name != 'model':
+            # En cuanto hay un modelo cargado se cuenta con su tokenizador
+            self.context_packer.set_counter(lambda text: len(tokenizer(text)), 'model')
+        with span('context_packing'):
+            packed = self.context_packer.pack([doc.page_content for doc in docs])
+        logger.info("RAG - Contexto: %d tokens de %d (%d fragmentos, %d tokens ahorrados)",
+                    packed.tokens, packed.candidate_tokens, packed.chunks_used, packed.tokens_saved)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("RAG - Contexto recuperado:\n%s", packed.text)
+        return packed.text
+    
+    def stream_generation(self, query: str, context: Optional[str] = None,
+                          priority: int = PRIORITY_BATCH,
+                          should_stop: Optional[Callable[[], bool]] = None,
+                          sections: int = DEFAULT_SECTIONS, instructions: str = '',
+                          is_complete: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """Yield generated tokens as the LLM produces them
+
+        should_stop is checked after every token; when it returns True decoding is
+        cancelled. A stopped generation is only cached if is_complete (when given)
+        confirms the text so far is usable, e.g. no section came out empty.
+        """
+        if context is None:
+            context = self.retrieve_context(query)
+        prompt = self._generation_prompt_for(query, context, sections, instructions)
+        max_new_tokens = self.section_token_budget(sections)
+        cache_key = self._cache_key(query, context, sections, instructions)
+        cached = self.generation_cache.get(cache_key)
+        if cached is not None:
+            logger.info("RAG - Contenido en caché para: %s", query)
+            yield cached
+            return
+        
+        logger.info("RAG - Generando contenido en streaming para: %s", query)
+        tokens = []
+        stopped = False
+        stream = self.scheduler.stream(prompt, priority=priority, max_new_tokens=max_new_tokens)
+        try:
+            for token in stream:
+                tokens.append(token)
+                yield token
+                if should_stop and should_stop():
+                    logger.info("RAG - Generación detenida tras %d tokens: secciones completas", len(tokens))
+                    stopped = True
+                    break
+        finally:
+            # Cerrar el stream cancela la petición en el planificador
+            stream.close()
+        # Solo se guarda una generación completa (no si el cliente cortó el stream)
+        if stopped and is_complete is not None and not is_complete():
+            logger.warning("RAG - Generación detenida con secciones vacías, no se guarda en caché")
+            return
+        self.generation_cache.put(cache_key, "".join(tokens))
+    
+    def _cache_key(self, query: str, context: str, sections: int = DEFAULT_SECTIONS,
+                   instructions: str = '') -> str:
+        config = dict(self.llm_config, sections=sections, instructions=instructions,
+                      max_new_tokens=self.section_token_budget(sections))
+        return GenerationCache.make_key(query, context, self.model_path, config)
+    
+    def section_token_budget(self, sections: int) -> int:
+        """max_new_tokens for a call producing this many sections"""
+        return min(self.llm_config['max_new_tokens'], TOKENS_PER_SECTION * sections + 32)
+    
+    def _generation_prompt_for(self, query: str, context: str, sections: int, instructions: str) -> str:
+        with span('prompt'):
+            return self.generation_prompt.format(
+                context=context if context else "No hay información específica disponible.",
+                topic=query,
+                sections=sections,
+                instructions=f" {instructions}" if instructions else ''
+            )
     
-    def retrieve_information(self, query: str, generate: bool = False) -> str:
-        """Retrieve information from the vector store"""
+    def generate_raw(self, query: str, context: str, priority: int = PRIORITY_BATCH,
+                     sections: int = DEFAULT_SECTIONS, instructions: str = '') -> str:
+        """Generate the raw section text for a query and an already retrieved context"""
+        cache_key = self._cache_key(query, context, sections, instructions)
+        raw_content = self.generation_cache.get(cache_key)
+        if raw_content is not None:
+            logger.info("RAG - Contenido recuperado de caché para: %s", query)
+            return raw_content
+        # Generate content using LLM
+        prompt = self._generation_prompt_for(query, context, sections, instructions)
+        raw_content = self.scheduler.generate(prompt, priority=priority,
+                                              max_new_tokens=self.section_token_budget(sections))
+        self.generation_cache.put(cache_key, raw_content)
+        return raw_content
+    
+    def generate_outline(self, topic: str, context: str, sections: int = 4,
+                         priority: int = PRIORITY_BATCH, key_points: Optional[List[str]] = None) -> str:
+        """Generate the raw outline (numbered section titles) for a topic"""
+        instructions = f" Incluye secciones para estos puntos clave: {'; '.join(key_points)}." if key_points else ''
+        config = dict(self.llm_config, mode='outline', sections=sections, instructions=instructions,
+                      max_new_tokens=OUTLINE_MAX_NEW_TOKENS)
+        cache_key = GenerationCache.make_key(topic, context, self.model_path, config)
+        raw_outline = self.generation_cache.get(cache_key)
+        if raw_outline is None:
+            prompt = self.outline_prompt.format(
+                context=context if context else "No hay información específica disponible.",
+                topic=topic,
+                sections=sections,
+                instructions=instructions
+            )
+            raw_outline = self.scheduler.generate(prompt, priority=priority,
+                                                  max_new_tokens=OUTLINE_MAX_NEW_TOKENS)
+            self.generation_cache.put(cache_key, raw_outline)
+        return raw_outline
+    
+    def expand_sections(self, topic: str, titles: List[str], contexts: List[str],
+                        priority: int = PRIORITY_BATCH,
+                        key_points: Optional[List[str]] = None) -> List[str]:
+        """Expand every section with its own context; requests run concurrently in the pool
+
+        At most one section per model instance is queued at a time, and each
+        timeout counts from the start of its decoding, so long decks neither
+        fill the queue nor time out while waiting for their turn.
+        """
+        instructions = (f" Puntos clave de la presentación: {'; '.join(key_points)}."
+                        f" Desarrolla los que correspondan a esta sección.") if key_points else ''
+        config = dict(self.llm_config, mode='section', instructions=instructions,
+                      max_new_tokens=SECTION_MAX_NEW_TOKENS)
+        keys = [
+            GenerationCache.make_key(f"{topic}\n{title}", context, self.model_path, config)
+            for title, context in zip(titles, contexts)
+        ]
+        results: List[Optional[str]] = [self.generation_cache.get(key) for key in keys]
+        
+        pending = deque(i for i, result in enumerate(results) if result is None)
+        in_flight = deque()
         try:
-            print(f"\nRAG - Procesando consulta: {query}")
-            
-            # Get relevant documents - reducido a 2 documentos para menor contexto
-            docs = self.vector_store.similarity_search(query, k=2)
-            context = "\n".join(doc.page_content for doc in docs)
-            
-            # Limitar el contexto a 500 caracteres
-            if len(context) > 500:
-                context = context[:500] + "..."
+            while pending or in_flight:
+                while pending and len(in_flight) < max(1, self.scheduler.instances):
+                    i = pending.popleft()
+                    prompt = self.section_prompt.format(
+                        context=contexts[i] if contexts[i] else "No hay información específica disponible.",
+                        topic=topic,
+                        section=titles[i],
+                        instructions=instructions
+                    )
+                    in_flight.append((i, self.scheduler.submit(prompt, priority=priority,
+                                                               timeout_from_start=True,
+                                                               max_new_tokens=SECTION_MAX_NEW_TOKENS)))
+                i, inference_request = in_flight[0]
+                results[i] = inference_request.result()
+                in_flight.popleft()
+                self.generation_cache.put(keys[i], results[i])
+        except BaseException:
+            for _, inference_request in in_flight:
+                inference_request.cancel()
+            raise
+        return results
+    
+    def retrieve_information(self, query: str, generate: bool = False,
+                             progress_callback: Optional[Callable[[str, float], None]] = None,
+                             priority: int = PRIORITY_BATCH) -> str:
+        """Retrieve the packed context for a query, or the raw generated sections if generate=True"""
+        try:
+            logger.info("RAG - Procesando consulta: %s", query)
+            if progress_callback:
+                progress_callback('retrieving', 0.1)
             
-            print(f"\nRAG - Contexto recuperado:")
-            print(context)
+            context = self.retrieve_context(query)
             
             if generate:
-                print("\nRAG - Generando contenido con LLM...")
+                logger.info("RAG - Generando contenido con LLM...")
+                if progress_callback:
+                    progress_callback('generating', 0.2)
                 try:
-                    # Generate content using LLM
-                    raw_content = self.generation_chain.run(
-                        context=context if context else "No hay información específica disponible.",
-                        topic=query
-                    )
-                    print("\nRAG - Contenido generado:")
-                    print(raw_content)
-                    
-                    # Process the raw content into sections
-                    generator = ContentGenerator(raw_content)
-                    generator.process_content()
-                    sections_json = generator.to_json()
-                    print("\nRAG - Secciones generadas:")
-                    print(sections_json)
-                    
-                    # Convert sections to HTML
-                    html_output = self.generate_html_from_sections(json.loads(sections_json))
-                    print("\nRAG - HTML generado:")
-                    print(html_output)
-                    return html_output
+                    raw_content = self.generate_raw(query, context, priority=priority)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("RAG - Contenido generado:\n%s", raw_content)
+                    return raw_content
+                except InferenceQueueFullError:
+                    # Contrapresión: el llamador decide (p.ej. responder 429)
+                    raise
                 except Exception as llm_error:
                     print(f"\nRAG - Error con LLM: {str(llm_error)}")
                     traceback.print_exc()
-                    return self._get_fallback_content()
+                    return self.get_fallback_content()
             return context
             
+        except InferenceQueueFullError:
+            raise
         except Exception as e:
             print(f"\nRAG - Error general: {str(e)}")
             traceback.print_exc()
             if generate:
-                return self._get_fallback_content()
+                return self.get_fallback_content()
             return "Error recuperando información"
 
-    def generate_html_from_sections(self, sections):
-        """Convert sections to HTML format"""
-        html_content = '<html><head><title>Presentación</title></head><body>'
-        for section in sections:
-            html_content += f'<h2>{section["title"]}</h2>'
-            html_content += '<ul>'
-            for content in section["content"]:
-                html_content += f'<li>{content}</li>'
-            html_content += '</ul>'
-        html_content += '</body></html>'
-        return html_content
-
-    def _get_fallback_content(self) -> str:
+    def get_fallback_content(self) -> str:
         """Get fallback content when generation fails"""
         return """
         Sección 1 - Introducción al Tema
@@ -0,0 +1,85 @@
+# Índice semántico de temas ya generados para reutilizar presentaciones
+
+import os
+import threading
+from typing import Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from rag.embeddings import SymmetricEmbeddings
+from rag.index_factory import IndexConfig, load_vector_store, save_vector_store
+
+
+class TopicIndex:
+    """FAISS index of generated topics used to detect near-duplicate requests"""
+
+    def __init__(self, rag_handler, index_path: str = "rag/topic_index", threshold: float = 0.93):
+        self.rag_handler = rag_handler
+        self.index_path = index_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._store: Optional[FAISS] = None
+        self._loaded = False
+
+    def lookup(self, topic: str) -> Optional[Tuple[str, float]]:
+        """Return (presentation_id, cosine similarity) of the closest stored topic above the threshold"""
+        with self._lock:
+            store = self._load()
+            if store is None:
+                return None
+            results = store.similarity_search_with_score(topic, k=1)
+        if not results:
+            return None
+        doc, score = results[0]
+        # Con vectores normalizados el producto interno es la similitud coseno
+        if score < self.threshold:
+            return None
+        return doc.metadata['presentation_id'], float(score)
+
+    def add(self, topic: str, presentation_id: str) -> None:
+        """Register a generated topic and persist the index"""
+        metadata = {'presentation_id': presentation_id, 'topic': topic}
+        with self._lock:
+            store = self._load()
+            if store is None:
+                self._store = FAISS.from_texts(
+                    [topic], self._embeddings,
+                    metadatas=[metadata],
+                    ids=[presentation_id],
+                    normalize_L2=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+            else:
+                store.add_texts([topic], metadatas=[metadata], ids=[presentation_id])
+            save_vector_store(self._store, self.index_path)
+
+    def remove(self, presentation_id: str) -> None:
+        """Forget a presentation (e.g. when its JSON no longer exists)"""
+        with self._lock:
+            store = self._load()
+            if store is None or presentation_id not in store.index_to_docstore_id.values():
+                return
+            store.delete([presentation_id])
+            save_vector_store(store, self.index_path)
+
+    @property
+    def _embeddings(self) -> SymmetricEmbeddings:
+        # Tema contra tema: ambos lados se embeben como consulta
+        return SymmetricEmbeddings(self.rag_handler.embeddings)
+
+    def _load(self) -> Optional[FAISS]:
+        if not self._loaded:
+            self._loaded = True
+            if os.path.exists(os.path.join(self.index_path, "index.faiss")):
+                print("Cargando índice de temas existente...")
+                self._store = load_vector_store(
+                    self.index_path,
+                    self._embeddings,
+                    IndexConfig(),
+                    # Los temas no se pueden regenerar: un docstore pickle antiguo se migra
+                    migrate_legacy=True,
+                    normalize_L2=True,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                )
+        return self._store
@@ -0,0 +1,117 @@
+# Lógica para generar presentaciones PPTX en memoria a partir del JSON de slides
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from pptx import Presentation
+
+# Layouts del template por defecto de python-pptx
+TITLE_LAYOUT = 0
+CONTENT_LAYOUT = 1
+
+# Renderer de cada proceso del pool (ver _init_worker)
+_worker_renderer = None
+
+
+class PPTXRenderer:
+    """Render presentation JSON into .pptx bytes without touching shared paths
+
+    The base template is read once and kept in memory. Each render parses those
+    bytes again on purpose: python-pptx adds slides to the parsed package in
+    place, so a parsed template cannot be shared between renders. Batches go
+    to a long-lived process pool whose workers receive the template once.
+    """
+
+    def __init__(self, template_path: Optional[str] = None, template_bytes: Optional[bytes] = None,
+                 processes: Optional[int] = None):
+        if template_bytes is None:
+            template_bytes = self._load_template(template_path)
+        self.template_bytes = template_bytes
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @staticmethod
+    def _load_template(template_path: Optional[str]) -> bytes:
+        if template_path and os.path.exists(template_path):
+            with open(template_path, 'rb') as f:
+                return f.read()
+        # Template en blanco por defecto
+        buffer = BytesIO()
+        Presentation().save(buffer)
+        return buffer.getvalue()
+
+    def render(self, presentation_data: Dict) -> BytesIO:
+        """Render a presentation into a BytesIO positioned at the start"""
+        presentation = Presentation(BytesIO(self.template_bytes))
+        topic = presentation_data.get('topic') or 'Presentación'
+        self._add_title_slide(presentation, topic, "Presentación generada automáticamente")
+
+        for slide in presentation_data.get('slides', []):
+            content = slide.get('content', [])
+            if not isinstance(content, list):
+                content = [content]
+            self._add_content_slide(presentation, slide.get('title', ''), content, slide.get('notes'))
+
+        buffer = BytesIO()
+        presentation.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    def render_bytes(self, presentation_data: Dict) -> bytes:
+        return self.render(presentation_data).getvalue()
+
+    def render_many(self, presentations: List[Dict]) -> List[bytes]:
+        """Render several presentations in parallel worker processes"""
+        if len(presentations) <= 1:
+            return [self.render_bytes(data) for data in presentations]
+        return list(self._get_pool().map(_render_in_worker, presentations))
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Los procesos se lanzan una vez y cargan el template en su inicializador
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.template_bytes,))
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    @staticmethod
+    def _add_title_slide(presentation, title: str, subtitle: Optional[str]) -> None:
+        slide = presentation.slides.add_slide(presentation.slide_layouts[TITLE_LAYOUT])
+        slide.shapes.title.text = title
+        if subtitle and len(slide.placeholders) > 1:
+            slide.placeholders[1].text = subtitle
+
+    @staticmethod
+    def _add_content_slide(presentation, title: str, content: List[str], notes: Optional[str]) -> None:
+        slide = presentation.slides.add_slide(presentation.slide_layouts[CONTENT_LAYOUT])
+        slide.shapes.title.text = title
+
+        text_frame = slide.placeholders[1].text_frame
+        points = [str(point) for point in content if str(point).strip()]
+        if points:
+            text_frame.text = points[0]
+            for point in points[1:]:
+                text_frame.add_paragraph().text = point
+
+        if notes:
+            slide.notes_slide.notes_text_frame.text = notes
+
+
+def _init_worker(template_bytes: bytes) -> None:
+    global _worker_renderer
+    _worker_renderer = PPTXRenderer(template_bytes=template_bytes)
+
+
+def _render_in_worker(presentation_data: Dict) -> bytes:
+    return _worker_renderer.render_bytes(presentation_data)
@@ -0,0 +1,52 @@
+from rag.context_packer import ContextPacker
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def make_packer(budget):
+    return ContextPacker(token_budget=budget, count_tokens=count_words, tokenizer_name='words')
+
+
+def test_keeps_every_chunk_within_budget():
+    packed = make_packer(100).pack(["uno dos tres", "cuatro cinco", "seis"])
+    assert packed.text == "uno dos tres\ncuatro cinco\nseis"
+    assert packed.chunks_used == 3
+    assert packed.chunks_dropped == 0
+    assert packed.tokens_saved == 0
+
+
+def test_drops_chunks_that_exceed_budget():
+    chunks = ["alfa beta gamma delta", "epsilon zeta eta theta iota kappa", "lambda mu"]
+    packed = make_packer(8).pack(chunks)
+    # 4 + 1 y 2 + 1 tokens caben; el segundo fragmento (6 + 1) ya no
+    assert packed.text == "alfa beta gamma delta\nlambda mu"
+    assert packed.tokens == 8
+    assert packed.tokens <= 8
+    assert packed.chunks_dropped == 1
+    assert packed.candidate_tokens == 5 + 7 + 3
+
+
+def test_prefers_novel_chunks_over_duplicates():
+    chunks = ["sol agua viento", "sol agua viento", "tierra fuego roca"]
+    packed = ContextPacker(token_budget=8, mmr_lambda=0.5,
+                           count_tokens=count_words).pack(chunks)
+    assert packed.text == "sol agua viento\ntierra fuego roca"
+
+
+def test_trims_oversized_chunk_to_whole_sentences():
+    chunk = "Primera frase corta. Segunda frase algo más larga que la primera. Tercera."
+    packed = make_packer(6).pack([chunk])
+    assert packed.text == "Primera frase corta."
+    assert packed.chunks_used == 1
+    assert packed.tokens <= 6
+
+
+def test_budget_override_and_stats():
+    packer = make_packer(100)
+    packed = packer.pack(["uno dos tres", "cuatro cinco"], token_budget=4)
+    assert packed.text == "uno dos tres"
+    stats = packer.stats()
+    assert stats['packed'] == 1
+    assert stats['tokens_saved'] == packed.tokens_saved
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from rag import generation_cache
+from rag.generation_cache import GenerationCache
+
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    # created_at va dentro del JSON: con la hora fija, valores iguales ocupan lo mismo en disco
+    monkeypatch.setattr(generation_cache, 'time', SimpleNamespace(time=lambda: 1700000000.0))
+
+
+def disk_size(cache, *keys):
+    return sum(os.path.getsize(cache._path(key)) for key in keys)
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = GenerationCache(str(tmp_path), max_memory_items=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    cache.get('a')
+    cache.put('c', 'C')
+    assert list(cache._memory) == ['a', 'c']
+    # "b" sigue en disco y vuelve a memoria al leerse
+    assert cache.get('b') == 'B'
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_disk_tier_evicts_oldest_files_over_budget(tmp_path):
+    cache = GenerationCache(str(tmp_path), max_memory_items=0)
+    for i, key in enumerate(('a', 'b')):
+        cache.put(key, 'x' * 100)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    cache.max_disk_bytes = disk_size(cache, 'a', 'b')
+    # Leer "a" la marca como usada recientemente: la expulsada debe ser "b"
+    assert cache.get('a') == 'x' * 100
+    cache.put('c', 'x' * 100)
+
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'c.json']
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['disk_bytes'] == disk_size(cache, 'a', 'c')
+    assert stats['disk_bytes'] <= cache.max_disk_bytes
+    assert cache.get('b') is None
+
+
+def test_disk_size_is_recomputed_on_startup(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    reopened = GenerationCache(str(tmp_path))
+    assert reopened.stats()['disk_bytes'] == disk_size(cache, 'a', 'b')
+    assert reopened.get('a') == 'A'
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    cache.put('a', 'A')
+    cache.put('a', 'AAAA')
+    assert cache.stats()['disk_bytes'] == disk_size(cache, 'a')
+
+
+def test_make_key_normalizes_topic():
+    key = GenerationCache.make_key('  Energía   Solar ', 'ctx', 'model.gguf', {'t': 0.7})
+    assert key == GenerationCache.make_key('energía solar', 'ctx', 'model.gguf', {'t': 0.7})
+    assert key != GenerationCache.make_key('energía solar', 'otro', 'model.gguf', {'t': 0.7})
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    cache.put('a', 'A')
+    cache.clear()
+    assert cache.get('a') is None
+    assert cache.stats()['memory_items'] == 0
+    assert cache.stats()['disk_bytes'] == 0
@@ -0,0 +1,64 @@
+from document_management.presentation_store import PresentationStore
+
+
+def make_store(tmp_path, count=5, created_at=1000.0):
+    store = PresentationStore(str(tmp_path / 'presentations.db'))
+    for i in range(count):
+        store.save({'id': f'p{i}', 'topic': f'Tema {i}', 'slides': [{}] * i},
+                   created_at=created_at + i)
+    return store
+
+
+def collect_pages(store, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = store.list(limit=limit, cursor=cursor, **kwargs)
+        pages.append([item['id'] for item in page['items']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_pages_newest_first_without_gaps(tmp_path):
+    store = make_store(tmp_path)
+    assert collect_pages(store, limit=2) == [['p4', 'p3'], ['p2', 'p1'], ['p0']]
+
+
+def test_last_full_page_has_no_cursor(tmp_path):
+    store = make_store(tmp_path, count=4)
+    first = store.list(limit=2)
+    second = store.list(limit=2, cursor=first['next_cursor'])
+    assert [item['id'] for item in second['items']] == ['p1', 'p0']
+    assert second['next_cursor'] is None
+
+
+def test_ties_on_created_at_are_paged_by_id(tmp_path):
+    store = PresentationStore(str(tmp_path / 'presentations.db'))
+    for presentation_id in ('a', 'b', 'c', 'd'):
+        store.save({'id': presentation_id, 'topic': 'Igual'}, created_at=1000.0)
+    assert collect_pages(store, limit=3) == [['d', 'c', 'b'], ['a']]
+
+
+def test_cursor_is_stable_when_newer_rows_arrive(tmp_path):
+    store = make_store(tmp_path)
+    first = store.list(limit=2)
+    store.save({'id': 'nueva', 'topic': 'Tema nuevo'}, created_at=2000.0)
+    second = store.list(limit=2, cursor=first['next_cursor'])
+    assert [item['id'] for item in second['items']] == ['p2', 'p1']
+
+
+def test_topic_prefix_filter_pages(tmp_path):
+    store = make_store(tmp_path)
+    store.save({'id': 'x', 'topic': 'Otro asunto'}, created_at=1500.0)
+    store.save({'id': 'y', 'topic': 'tema_con_guion'}, created_at=500.0)
+    assert collect_pages(store, limit=2, topic='TEMA') == [['p4', 'p3'], ['p2', 'p1'], ['p0', 'y']]
+    # "_" es literal, no un comodín de LIKE
+    assert collect_pages(store, limit=10, topic='tema_') == [['y']]
+
+
+def test_summaries_and_save_keeps_created_at(tmp_path):
+    store = make_store(tmp_path, count=3)
+    store.save({'id': 'p1', 'topic': 'Tema 1 editado', 'slides': [{}] * 7})
+    items = {item['id']: item for item in store.list()['items']}
+    assert items['p1'] == {'id': 'p1', 'topic': 'Tema 1 editado', 'created_at': 1001.0, 'slide_count': 7}
+    assert store.count() == 3
@@ -0,0 +1,89 @@
+from content_generation.section_parser import SectionStreamParser, parse_outline, split_points
+
+DECK = """Sección 1 - Introducción
+Contenido detallado: Qué es. Para qué sirve. Dónde se usa.
+
+Sección 2 - Conclusión
+Contenido detallado:
+
+- Resumen de ideas.
+- Próximos pasos.
+
+Sección 3 - Sobrante
+Contenido detallado: No se pide.
+"""
+
+
+def feed_tokens(parser, text, size=3):
+    slides = []
+    for i in range(0, len(text), size):
+        slides.extend(parser.feed(text[i:i + size]))
+        if parser.done:
+            break
+    return slides
+
+
+def test_parses_sections_and_points():
+    parser = SectionStreamParser()
+    slides = parser.feed(DECK) + parser.close()
+    assert [slide.title for slide in slides] == ['Introducción', 'Conclusión', 'Sobrante']
+    assert slides[0].content == ['Qué es.', 'Para qué sirve.', 'Dónde se usa.']
+    assert slides[1].content == ['Resumen de ideas.', 'Próximos pasos.']
+
+
+def test_blank_line_after_content_label_does_not_close_last_section():
+    parser = SectionStreamParser(max_sections=2)
+    slides = feed_tokens(parser, DECK)
+    assert parser.done and parser.complete
+    assert slides[1].title == 'Conclusión'
+    assert slides[1].content == ['Resumen de ideas.', 'Próximos pasos.']
+
+
+def test_last_section_closes_once_it_has_the_expected_points():
+    parser = SectionStreamParser(max_sections=1, expected_points=3)
+    slides = feed_tokens(parser, DECK)
+    assert parser.done
+    assert len(slides) == 1
+    # No hace falta esperar a la cabecera de la sección 2
+    assert parser.feed("Sección 2 - Otra\n") == []
+
+
+def test_blank_lines_between_bullets_do_not_close_last_section():
+    parser = SectionStreamParser(max_sections=1)
+    slides = feed_tokens(parser, "## Sección 1 - B\n- x\n\n- y\n- z\n\n")
+    assert not parser.done
+    slides += parser.close()
+    assert [(slide.title, slide.content) for slide in slides] == [('B', ['x', 'y', 'z'])]
+
+
+def test_last_section_waits_for_expected_points_across_blank_lines():
+    parser = SectionStreamParser(max_sections=2, expected_points=3)
+    text = "Sección 1 - A\n- a\n\nSección 2 - B\n- x\n\n- y\n\n- z\nSección 3 - C\n- no\n"
+    slides = feed_tokens(parser, text)
+    assert parser.done and parser.complete
+    assert slides[1].content == ['x', 'y', 'z']
+
+
+def test_empty_section_is_not_complete():
+    parser = SectionStreamParser(max_sections=2)
+    text = "Sección 1 - Vacía\n\nSección 2 - Llena\nUn punto.\n\nSección 3 - Sobrante\n"
+    slides = parser.feed(text)
+    assert parser.done
+    assert slides[0].content == []
+    assert not parser.complete
+
+
+def test_close_flushes_pending_section_without_newline():
+    parser = SectionStreamParser()
+    slides = parser.feed("Sección 1: Título\nÚltimo punto") + parser.close()
+    assert slides[0].title == 'Título'
+    assert slides[0].content == ['Último punto']
+
+
+def test_parse_outline_ignores_preamble():
+    text = "Aquí tienes el esquema:\n1. Origen\n2. Evolución\n- Futuro"
+    assert parse_outline(text) == ['Origen', 'Evolución', 'Futuro']
+
+
+def test_split_points_strips_prefixes():
+    assert split_points(["Contenido detallado: Uno. Dos!", "- Tres"]) == ['Uno.', 'Dos!', 'Tres']
@@ -2,7 +2,7 @@
 
 from flask import request
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List
 
 @dataclass
 class UserInput:
@@ -36,6 +36,27 @@ class InputHandler:
         
         output_format = request.form.get('output_format', 'pptx').lower()
         
+        return InputHandler._build(topic, key_points, slides_count, output_format)
+
+    @staticmethod
+    def parse_json(data: Dict, default_slides_count: int = 5) -> UserInput:
+        """Process and validate user input from a JSON body (key_points as a list or lines)"""
+        topic = str(data.get('topic', '')).strip()
+        key_points = data.get('key_points') or []
+        if isinstance(key_points, str):
+            key_points = key_points.split('\n')
+        key_points = [str(p).strip() for p in key_points if str(p).strip()]
+        try:
+            slides_count = int(data.get('slides_count', default_slides_count))
+        except (TypeError, ValueError):
+            raise ValueError("Slides count must be an integer")
+        
+        output_format = str(data.get('output_format', 'pptx')).lower()
+        
+        return InputHandler._build(topic, key_points, slides_count, output_format)
+
+    @staticmethod
+    def _build(topic: str, key_points: List[str], slides_count: int, output_format: str) -> UserInput:
         if not InputHandler.validate_topic(topic):
             raise ValueError("Topic cannot be empty")
         